@@ -0,0 +1,194 @@
+"""Resolve the matches to a one-to-one linkage, where each left record and each
+right record is in at most one match.
+
+Only the matches that conflict, by sharing a left or right record directly or
+through other matches, are assigned together. Each connected component of the
+match graph is assigned on its own, over its matches only, so the work scales
+with the conflicting components rather than the full match list.
+"""
+import math
+import heapq
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+Match = Dict[str, Any]
+
+
+def find(parent: Dict[int, int], node: int) -> int:
+    """Return the root of `node`, halving the path along the way."""
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+def conflict_components(matches: List[Match]) -> List[List[Match]]:
+    """Group the conflicting matches into the connected components of the match graph.
+
+    Left records are the nodes `_id_1` and right records are the nodes `~_id_2`.
+    Matches that share neither record with another match are left out.
+    """
+    degree_1 = Counter(match['_id_1'] for match in matches)
+    degree_2 = Counter(match['_id_2'] for match in matches)
+    conflicting = [
+        match for match in matches
+        if degree_1[match['_id_1']] > 1 or degree_2[match['_id_2']] > 1
+    ]
+
+    parent: Dict[int, int] = {}
+    for match in conflicting:
+        left, right = match['_id_1'], ~match['_id_2']
+        parent.setdefault(left, left)
+        parent.setdefault(right, right)
+        root_1, root_2 = find(parent, left), find(parent, right)
+        if root_1 != root_2:
+            parent[root_2] = root_1
+
+    components: Dict[int, List[Match]] = {}
+    for match in conflicting:
+        components.setdefault(find(parent, match['_id_1']), []).append(match)
+
+    return list(components.values())
+
+
+def greedy_assign(matches: List[Match]) -> List[Match]:
+    """Keep the best scoring matches whose records are not already taken.
+
+    Matches are bucketed by score so only the distinct scores are sorted, and
+    ties keep the order of `matches`.
+    """
+    buckets: Dict[float, List[Match]] = {}
+    for match in matches:
+        buckets.setdefault(match['score'], []).append(match)
+
+    taken_1, taken_2 = set(), set()
+    kept = []
+    for score in sorted(buckets, reverse=True):
+        for match in buckets[score]:
+            if match['_id_1'] in taken_1 or match['_id_2'] in taken_2:
+                continue
+            taken_1.add(match['_id_1'])
+            taken_2.add(match['_id_2'])
+            kept.append(match)
+
+    return kept
+
+
+Edge = Tuple[int, float, Optional[Match]]
+
+
+def _shortest_path(
+    row: int,
+    edges: List[List[Edge]],
+    columns: Dict[int, int],
+    mates: Dict[int, Edge],
+    potentials: List[float],
+) -> Tuple[Dict[int, float], int, Dict[int, Tuple[int, Optional[Match]]]]:
+    """Run Dijkstra from `row` over the reduced costs of the unmatched edges
+    from rows to columns and the matched edges back, until a free column.
+
+    :returns: The distance of each settled node, the free column, and the
+        previous row and edge of each reached column.
+    """
+    settled: Dict[int, float] = {}
+    distances: Dict[int, float] = {}
+    previous: Dict[int, Tuple[int, Optional[Match]]] = {}
+    heap = [(0.0, row)]
+    while True:
+        distance, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled[node] = distance
+        if node >= len(edges):
+            if node not in mates:
+                return settled, node, previous
+            next_row, cost, _ = mates[node]
+            reduced = -cost + potentials[node] - potentials[next_row]
+            heapq.heappush(heap, (distance + max(reduced, 0.0), next_row))
+            continue
+
+        for column, cost, match in edges[node]:
+            if column in settled or columns.get(node) == column:
+                continue
+            next_distance = distance + max(cost + potentials[node] - potentials[column], 0.0)
+            if next_distance < distances.get(column, math.inf):
+                distances[column] = next_distance
+                previous[column] = (node, match)
+                heapq.heappush(heap, (next_distance, column))
+
+
+def optimal_assign(matches: List[Match]) -> List[Match]:
+    """Keep the matches with the highest total score.
+
+    Rows are the left records and columns the right records, plus a column
+    for each row that leaves it unassigned for no cost. The rows are added
+    one at a time along the cheapest augmenting path, found with Dijkstra
+    over the matches only and node potentials that keep the reduced costs
+    non-negative, as in the Hungarian algorithm on a sparse graph.
+    """
+    ids_1 = sorted({match['_id_1'] for match in matches})
+    ids_2 = sorted({match['_id_2'] for match in matches})
+    n, m = len(ids_1), len(ids_2)
+    index_1 = {id: i for i, id in enumerate(ids_1)}
+    index_2 = {id: n + j for j, id in enumerate(ids_2)}
+    # The columns of each row with the cost `-score`, and its own free column.
+    edges: List[List[Edge]] = [[(n + m + i, 0.0, None)] for i in range(n)]
+    # Free columns keep a potential of 0, so their distances compare directly.
+    potentials = [0.0] * (n + m + n)
+    for match in matches:
+        row, column, cost = index_1[match['_id_1']], index_2[match['_id_2']], -match['score']
+        edges[row].append((column, cost, match))
+        potentials[row] = max(potentials[row], -cost)
+
+    # The column of each matched row, and the `(row, cost, match)` of each matched column.
+    columns: Dict[int, int] = {}
+    mates: Dict[int, Edge] = {}
+    for row in range(n):
+        settled, column, previous = _shortest_path(row, edges, columns, mates, potentials)
+        # Nodes reached later than the free column keep their potentials.
+        to_free = settled[column]
+        for node, distance in settled.items():
+            potentials[node] += distance - to_free
+
+        path_row = -1
+        while path_row != row:
+            path_row, path_match = previous[column]
+            cost = 0.0 if path_match is None else -path_match['score']
+            next_column = columns.get(path_row, -1)
+            columns[path_row] = column
+            mates[column] = (path_row, cost, path_match)
+            column = next_column
+
+    assigned = (mates[column][2] for column in range(n, n + m) if column in mates)
+    return [match for match in assigned if match is not None]
+
+
+ASSIGN_METHODS = {
+    'greedy': greedy_assign,
+    'optimal': optimal_assign,
+}
+
+
+def one_to_one(matches: List[Match], method: str = 'greedy') -> List[Match]:
+    """Return the matches kept by the `greedy` or `optimal` assignment, in
+    their original order.
+    """
+    if method not in ASSIGN_METHODS:
+        raise Exception(f"Unknown one-to-one method: {method}")
+
+    assign_fn = ASSIGN_METHODS[method]
+    dropped: Set[Tuple[int, int]] = set()
+    components = conflict_components(matches)
+    for component in components:
+        kept = {(match['_id_1'], match['_id_2']) for match in assign_fn(component)}
+        dropped.update(
+            (match['_id_1'], match['_id_2']) for match in component
+            if (match['_id_1'], match['_id_2']) not in kept
+        )
+
+    assigned = [match for match in matches if (match['_id_1'], match['_id_2']) not in dropped]
+    print(
+        f"[INFO] One-to-one ({method}): kept {len(assigned)} of {len(matches)} matches, "
+        f"{len(components)} conflicting groups"
+    )
+    return assigned
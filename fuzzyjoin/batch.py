@@ -0,0 +1,233 @@
+"""Run many joins from a manifest in one process, sharing the loaded tables
+and ngram indexes between the jobs.
+
+A manifest is a YAML or JSON file such as:
+
+    defaults:
+      threshold: 0.8
+    jobs:
+      - left: invoices.csv
+        right: vendors.csv
+        fields: [vendor, name]
+        output: invoice_matches.csv
+        multiples: invoice_multiples.csv
+
+Each job accepts the options of the `join` command with underscores, such as
+`numbers_exact` or `ngram_size`. Relative paths are relative to the manifest.
+"""
+import os
+import json
+import time
+import traceback
+from typing import Any, Dict, List, Sequence, Tuple
+
+from . import io, utils, external, compare, collate, tune, assign
+from .checkpoint import describe
+
+
+# Job keys and their defaults, other than the required `left`, `right` and `fields`.
+JOB_DEFAULTS = {
+    'threshold': 0.7,
+    'output': 'matches.csv',
+    'multiples': None,
+    'exclude': None,
+    'collate': None,
+    'compare': None,
+    'scorer': 'levenshtein',
+    'numbers_exact': False,
+    'numbers_permutation': False,
+    'numbers_subset': False,
+    'ngram_size': 3,
+    'target_recall': 0.99,
+    'max_block_size': 0,
+    'one_to_one': None,
+    'dedupe': False,
+    'memory_budget': None,
+    'checkpoint': None,
+    'score_cache': None,
+    'score_cache_size': 1000000,
+    'show_progress': True,
+}
+# Job keys holding file paths.
+PATH_KEYS = ('left', 'right', 'output', 'multiples', 'checkpoint', 'score_cache')
+
+
+def load_manifest(filepath: str) -> Dict[str, Any]:
+    """Load a YAML or JSON manifest. YAML requires PyYAML."""
+    with open(filepath, 'r') as f:
+        if filepath.lower().endswith('.json'):
+            return json.load(f)
+
+        try:
+            import yaml  # type: ignore
+        except ImportError:
+            raise Exception("YAML manifests require PyYAML: pip install fuzzyjoin[batch]")
+        return yaml.safe_load(f)
+
+
+def manifest_jobs(manifest: Dict[str, Any], base_dir: str) -> List[Dict[str, Any]]:
+    """Return the jobs of `manifest` with the defaults applied and the paths
+    resolved relative to `base_dir`.
+    """
+    defaults = manifest.get('defaults') or {}
+    jobs = []
+    for i, spec in enumerate(manifest.get('jobs') or []):
+        job = dict(JOB_DEFAULTS, **defaults)
+        job.update(spec)
+        unknown = set(job) - set(JOB_DEFAULTS) - {'left', 'right', 'fields', 'name'}
+        missing = {'left', 'right', 'fields'} - set(job)
+        if unknown or missing:
+            raise Exception(
+                f"Job {i}: unknown keys {sorted(unknown)}, missing keys {sorted(missing)}"
+            )
+        for key in PATH_KEYS:
+            if job[key] is not None:
+                job[key] = io.resolve_path(job[key], base_dir)
+        job.setdefault('name', f"{i}: {os.path.basename(job['left'])}")
+        jobs.append(job)
+
+    return jobs
+
+
+def job_options(job: Dict[str, Any]) -> compare.Options:
+    """Return the `Options` for `job`."""
+    field_1, field_2 = job['fields']
+    collate_fn = utils.import_function(job['collate']) if job['collate'] else None
+    exclude_fn = utils.import_function(job['exclude']) if job['exclude'] else None
+    compare_fn = utils.import_function(job['compare']) if job['compare'] else None
+    ngram_size = utils.parse_ngram_size(job['ngram_size'])
+    options = compare.Options(
+        field_1=field_1,
+        field_2=field_2,
+        threshold=job['threshold'],
+        scorer=job['scorer'],
+        ngram_size=3 if ngram_size == 'auto' else ngram_size,
+        max_block_size=job['max_block_size'],
+        collate_fn=collate_fn or collate.default_collate,
+        exclude_fn=exclude_fn or compare.default_exclude,
+        compare_fn=compare_fn or compare.default_compare,
+        show_progress=job['show_progress'],
+        checkpoint_dir=job['checkpoint'],
+        dedupe=job['dedupe'],
+        score_cache=job['score_cache'],
+        score_cache_size=job['score_cache_size'],
+        numbers_exact=job['numbers_exact'],
+        numbers_permutation=job['numbers_permutation'],
+        numbers_subset=job['numbers_subset'],
+    )
+    if job['memory_budget']:
+        options.memory_budget = utils.parse_size(str(job['memory_budget']))
+        options.blocker_fn = external.external_ngram_blocker
+
+    return options
+
+
+def table_key(filepath: str, field: str) -> Tuple[str, str]:
+    """Return the key of the table of `filepath` loaded for a join on `field`.
+
+    CSV files load complete rows and are keyed by file alone, while Parquet
+    files and SQLite tables only load `field`.
+    """
+    partial = io.is_sqlite(filepath) or io.is_parquet(filepath)
+    return (os.path.abspath(filepath), field if partial else '')
+
+
+class JoinCache:
+    """The tables keyed by `table_key` and the ngram indexes keyed by
+    `(table_key, field, collate, ngram_size, records)` that were loaded by earlier jobs.
+    """
+
+    def __init__(self):
+        self.tables: Dict[Tuple[str, str], Sequence[Dict]] = {}
+        self.indexes: Dict[Tuple[str, str, str, str, int, int], compare.NgramIndex] = {}
+
+    def records(self, filepath: str, field: str) -> Sequence[Dict]:
+        key = table_key(filepath, field)
+        if key not in self.tables:
+            self.tables[key] = io.load_records(filepath, [field])
+        else:
+            print(f"[INFO] Reusing table: {filepath}")
+
+        return self.tables[key]
+
+    def ngram_blocker(self, filepath: str):
+        """Return a blocker that reuses the ngram index of `filepath`."""
+        def cached_ngram_blocker(table_1, table_2, options):
+            # With `dedupe` the index is built over the distinct values of the
+            # table, which are told apart from the full table by their count.
+            key = table_key(filepath, options['field_2']) + (
+                options['field_2'], describe(options['collate_fn']),
+                options['ngram_size'], len(table_2)
+            )
+            if key not in self.indexes:
+                self.indexes[key] = compare.compact_index_by_ngrams(
+                    table_2, options['ngram_size'],
+                    index_key=options['field_2'],
+                    tx_fn=options['collate_fn']
+                )
+            else:
+                print(f"[INFO] Reusing ngram index: {filepath}")
+            return compare.block_by_candidates(table_1, self.indexes[key], options)
+
+        return cached_ngram_blocker
+
+    def retain(self, table_keys: set):
+        """Drop the tables and indexes not in `table_keys`."""
+        for key in list(self.tables):
+            if key not in table_keys:
+                del self.tables[key]
+        for index_key in list(self.indexes):
+            if index_key[:2] not in table_keys:
+                del self.indexes[index_key]
+
+
+def job_table_keys(job: Dict[str, Any]) -> set:
+    field_1, field_2 = job['fields']
+    return {table_key(job['left'], field_1), table_key(job['right'], field_2)}
+
+
+def run_job(job: Dict[str, Any], cache: JoinCache, yes: bool = False):
+    """Run a single job of a manifest using `cache` for its tables and indexes."""
+    options = job_options(job)
+    if options.blocker_fn is compare.ngram_blocker:
+        options.blocker_fn = cache.ngram_blocker(job['right'])
+
+    left_records = cache.records(job['left'], options.field_1)
+    right_records = cache.records(job['right'], options.field_2)
+    if job['ngram_size'] == 'auto':
+        tune.apply_tuning(left_records, right_records, options, job['target_recall'])
+    matches = compare.inner_join(left_records, right_records, options)
+    if job['one_to_one']:
+        matches = assign.one_to_one(matches, job['one_to_one'])
+    if not matches:
+        print("[INFO] No matches.")
+        return
+
+    matches = io.fetch_matched_rows(matches, left_records, right_records)
+    io.write_outputs(matches, job['output'], job['multiples'], yes=yes)
+
+
+def run_batch(manifest_file: str, yes: bool = False) -> int:
+    """Run the jobs of `manifest_file` and return the number that failed."""
+    manifest = load_manifest(manifest_file)
+    jobs = manifest_jobs(manifest, os.path.dirname(os.path.abspath(manifest_file)))
+    cache = JoinCache()
+    failed = 0
+    for i, job in enumerate(jobs):
+        print(f"[INFO] Job {job['name']}")
+        start_time = time.perf_counter()
+        try:
+            run_job(job, cache, yes=yes)
+        except Exception:
+            traceback.print_exc()
+            failed += 1
+
+        print(f"[INFO] Job {job['name']} : {time.perf_counter() - start_time:.2f}s")
+        # Keep only what the remaining jobs use.
+        remaining_keys: set = set()
+        for later_job in jobs[i + 1:]:
+            remaining_keys |= job_table_keys(later_job)
+        cache.retain(remaining_keys)
+
+    print(f"[INFO] Jobs: {len(jobs) - failed} succeeded, {failed} failed")
+    return failed
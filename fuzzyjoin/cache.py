@@ -0,0 +1,139 @@
+"""A persistent cache of `compare_fn` results so recurring joins don't score
+the same pairs of text again.
+"""
+import json
+import sqlite3
+import hashlib
+from typing import Any, Callable, Dict, List, Sequence
+
+from .checkpoint import describe
+
+
+# Default maximum number of cached pairs.
+DEFAULT_MAX_ENTRIES = 1000000
+# Number of new results written per transaction.
+WRITE_BATCH_SIZE = 10000
+# Number of keys looked up per query, below SQLite's parameter limit.
+LOOKUP_BATCH_SIZE = 500
+# Options that change the result of the default comparison.
+CONFIG_OPTIONS = (
+    'threshold', 'numbers_exact', 'numbers_permutation', 'numbers_subset',
+    'fuzzy_fn', 'scorer', 'collate_fn', 'compare_fn',
+)
+
+
+def comparator_config(options: Dict[str, Any]) -> str:
+    """Return a description of the options that change the comparison results."""
+    return ';'.join(f'{key}={describe(options[key])}' for key in CONFIG_OPTIONS)
+
+
+class ScoreCache:
+    """`compare_fn` results keyed by a hash of the comparator config and the text
+    of both join fields, stored in SQLite at `path`.
+
+    This assumes `compare_fn` only depends on the join fields of the records.
+    The least recently used pairs beyond `max_entries` are evicted on `close`.
+    """
+
+    def __init__(self, path: str, config: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.config = config
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._new: Dict[bytes, str] = {}
+        self._used: Dict[bytes, int] = {}
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores "
+                "(key BLOB PRIMARY KEY, results TEXT NOT NULL, used INTEGER NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS scores_used ON scores (used)")
+        self.clock = self.conn.execute("SELECT COALESCE(MAX(used), 0) FROM scores").fetchone()[0]
+
+    def key(self, text_1: str, text_2: str) -> bytes:
+        text = f'{self.config}\0{text_1}\0{text_2}'
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, Any]:
+        """Return the cached results of `keys` that are found."""
+        found = {key: json.loads(self._new[key]) for key in keys if key in self._new}
+        missing = [key for key in keys if key not in found]
+        for start in range(0, len(missing), LOOKUP_BATCH_SIZE):
+            batch = missing[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key, results FROM scores WHERE key IN ({placeholders})", batch
+            )
+            for key, results in rows:
+                found[key] = json.loads(results)
+
+        return found
+
+    def compare_many(
+        self,
+        record_1: Dict,
+        records_2: Sequence[Dict],
+        compare_fn: Callable,
+        options: Dict[str, Any],
+    ) -> List[Any]:
+        """Return the results of `compare_fn` for `record_1` and each of
+        `records_2`, scoring only the pairs that are not cached.
+        """
+        text_1 = record_1[options['field_1']]
+        keys = [self.key(text_1, record_2[options['field_2']]) for record_2 in records_2]
+        found = self.get_many(keys)
+        all_results = []
+        for key, record_2 in zip(keys, records_2):
+            self.clock += 1
+            results = found.get(key)
+            if results is None:
+                self.misses += 1
+                results = compare_fn(record_1, record_2, options)
+                self._new[key] = json.dumps(results, default=str)
+            else:
+                self.hits += 1
+            self._used[key] = self.clock
+            all_results.append(results)
+
+        if len(self._new) + len(self._used) >= WRITE_BATCH_SIZE:
+            self.flush()
+        return all_results
+
+    def flush(self):
+        """Write the new results and the last use of the cached results in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores (key, results, used) VALUES (?, ?, ?)",
+                [(key, results, self._used[key]) for key, results in self._new.items()]
+            )
+            self.conn.executemany(
+                "UPDATE scores SET used = ? WHERE key = ?",
+                [(used, key) for key, used in self._used.items() if key not in self._new]
+            )
+        self._new = {}
+        self._used = {}
+
+    def evict(self) -> int:
+        """Delete the least recently used pairs beyond `max_entries`."""
+        count = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM scores WHERE key IN "
+                    "(SELECT key FROM scores ORDER BY used LIMIT ?)", (excess,)
+                )
+        return max(excess, 0)
+
+    def close(self):
+        self.flush()
+        evicted = self.evict()
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        print(
+            f"[INFO] Score cache: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.1%} hit rate), {evicted} evicted"
+        )
+        self.conn.close()
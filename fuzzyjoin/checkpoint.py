@@ -0,0 +1,142 @@
+"""Checkpoints that let a long running `inner_join` resume after it is interrupted."""
+import os
+import json
+import time
+import hashlib
+import functools
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+
+# Seconds between checkpoints.
+CHECKPOINT_INTERVAL = 60.0
+# Options that don't change the matches, and so are not part of the fingerprint.
+IGNORED_OPTIONS = ('show_progress', 'checkpoint_dir', 'score_cache', 'score_cache_size')
+
+
+def describe(value: Any) -> str:
+    """Return a description of an option value that is stable across processes."""
+    if isinstance(value, functools.partial):
+        args = [describe(x) for x in value.args]
+        kwargs = [f'{k}={describe(v)}' for k, v in sorted(value.keywords.items())]
+        return f"partial({describe(value.func)}, {', '.join(args + kwargs)})"
+    if callable(value):
+        module = getattr(value, '__module__', '')
+        name = getattr(value, '__qualname__', getattr(value, '__name__', repr(value)))
+        return f'{module}.{name}'
+
+    return repr(value)
+
+
+def fingerprint(
+    table_1: Sequence[Dict], table_2: Sequence[Dict], options: Dict[str, Any]
+) -> str:
+    """Return a hash of the join fields of both tables and the options."""
+    digest = hashlib.sha256()
+    for key in sorted(options):
+        if key not in IGNORED_OPTIONS:
+            digest.update(f'{key}={describe(options[key])}\n'.encode('utf-8'))
+
+    for table, field in ((table_1, options['field_1']), (table_2, options['field_2'])):
+        digest.update(f'{len(table)}\n'.encode('utf-8'))
+        for record in table:
+            digest.update(f'{record[field]}\n'.encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """Persist the progress of `inner_join` in `directory`.
+
+    The matches are appended to `matches.jsonl` as they are found, and
+    `state.json` records the next left record to compare along with the
+    matches and bytes of `matches.jsonl` that belong to it. Matches written
+    after the last state are discarded when resuming.
+    """
+
+    def __init__(self, directory: str, fingerprint: str, interval: Optional[float] = None):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.interval = CHECKPOINT_INTERVAL if interval is None else interval
+        self.state_file = os.path.join(directory, 'state.json')
+        self.matches_file = os.path.join(directory, 'matches.jsonl')
+        self.match_count = 0
+        self.last_time = time.perf_counter()
+        self._out: Optional[BinaryIO] = None
+
+    def load_state(self) -> Dict[str, Any]:
+        """Return the saved state, or an empty state if there is no checkpoint
+        or it was made for other inputs or options.
+        """
+        empty = {'next_id_1': 0, 'total': 0, 'matches': 0, 'matches_bytes': 0}
+        if not os.path.exists(self.state_file):
+            return empty
+
+        with open(self.state_file, 'r') as f:
+            state = json.load(f)
+
+        if state['fingerprint'] != self.fingerprint:
+            print(f"[WARN] Ignoring checkpoint for different inputs or options: {self.directory}")
+            return empty
+
+        return state
+
+    def resume(
+        self, table_1: Sequence[Dict], table_2: Sequence[Dict]
+    ) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """Return the next left record id, the comparison count and the matches
+        of the last checkpoint, and prepare to append new matches.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        state = self.load_state()
+        matches = []
+        if state['matches']:
+            with open(self.matches_file, 'r') as f:
+                for _, line in zip(range(state['matches']), f):
+                    match = json.loads(line)
+                    match['record_1'] = table_1[match['_id_1']]
+                    match['record_2'] = table_2[match['_id_2']]
+                    matches.append(match)
+
+        self._out = open(self.matches_file, 'ab')
+        self._out.truncate(state['matches_bytes'])
+        self._out.seek(state['matches_bytes'])
+        self.match_count = len(matches)
+        return state['next_id_1'], state['total'], matches
+
+    def extend(self, matches: List[Dict[str, Any]]):
+        """Append `matches` without their records to the matches file."""
+        for match in matches:
+            record = {k: v for k, v in match.items() if k not in ('record_1', 'record_2')}
+            line = json.dumps(record, default=str) + '\n'
+            self._out.write(line.encode('utf-8'))  # type: ignore
+            self.match_count += 1
+
+    def update(self, next_id_1: int, total: int):
+        """Save the state if `interval` seconds have passed since the last save."""
+        if (time.perf_counter() - self.last_time) >= self.interval:
+            self.save(next_id_1, total)
+
+    def save(self, next_id_1: int, total: int):
+        """Flush the matches and atomically replace the state."""
+        out = self._out
+        out.flush()  # type: ignore
+        os.fsync(out.fileno())  # type: ignore
+        state = {
+            'fingerprint': self.fingerprint,
+            'next_id_1': next_id_1,
+            'total': total,
+            'matches': self.match_count,
+            'matches_bytes': out.tell(),  # type: ignore
+        }
+        temp_file = self.state_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.state_file)
+        self.last_time = time.perf_counter()
+
+    def close(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
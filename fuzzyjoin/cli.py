@@ -1,53 +1,128 @@
 # -*- coding: utf-8 -*-
-import os
-import pdb
 import sys
 import traceback
 
 import click
 
-from . import io, utils, compare as cmp, collate as cll
+from . import scorers
 
 # flake8: noqa
+# The other fuzzyjoin modules are imported by the commands that use them so
+# that `--help` and startup don't pay for them. `scorers` is light and lists
+# the `--scorer` choices.
 
 
-@click.command()
+class DefaultGroup(click.Group):
+    """Run the `join` command when the first argument isn't a command, so that
+    `fuzzyjoin [OPTIONS] LEFT_CSV RIGHT_CSV` keeps working.
+    """
+
+    default_command = "join"
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+class NgramSizeType(click.ParamType):
+    """A positive ngram size, or 'auto'."""
+
+    name = "integer|auto"
+
+    def convert(self, value, param, ctx):
+        from . import utils
+        try:
+            return utils.parse_ngram_size(value)
+        except Exception as e:
+            self.fail(str(e), param, ctx)
+
+
+def post_mortem(debug: bool):
+    traceback.print_exc()
+    if debug:
+        import pdb
+        pdb.post_mortem(sys.exc_info()[2])
+
+
+@click.group(cls=DefaultGroup)
+def main():
+    """Join tables by a fuzzy comparison of text columns.
+
+    Without a command, runs `join`: fuzzyjoin [OPTIONS] LEFT_CSV RIGHT_CSV
+    """
+
+
+@main.command("join")
 @click.option("-f", "--fields", nargs=2, required=True, help="<left_field> <right_field>")
 @click.option("-t", "--threshold", default=0.7, show_default=True, type=click.FLOAT, help="Only return matches above this score.")
-@click.option("-o", "--output", help="File to write the matches to.")
+@click.option("--thresholds", help="Comma separated thresholds, e.g. 0.6,0.7,0.8. Joins once at the lowest and reports the matches at each.")
+@click.option("--threshold-outputs", is_flag=True, help="With --thresholds, write the matches at each threshold to <output> and <multiples> with the threshold added to the name.")
+@click.option("-o", "--output", help="File to write the matches to (.csv or .parquet), or sqlite:///path.db?table=name.")
 @click.option("--multiples", "multiples_file", help="File for left IDs with multiple matches.")
 @click.option("--exclude", help="Function used to exclude records. See: <fuzzyjoin.compare.default_exclude>")
 @click.option("--collate", help="Function used to collate <fields>. See: <fuzzyjoin.collate.default_collate>")
 @click.option("--compare", help="Function used to compare records. See: <fuzzyjoin.compare.default_compare>")
+@click.option("--scorer", default="levenshtein", show_default=True, type=click.Choice(list(scorers.SCORERS)), help="Similarity of <fields>.")
 @click.option("--numbers-exact", is_flag=True, help="Numbers and order must match exactly.")
 @click.option("--numbers-permutation", is_flag=True, help="Numbers must match but may be out of order.")
 @click.option("--numbers-subset", is_flag=True, help="Numbers must be a subset.")
-@click.option("--ngram-size", default=3, show_default=True, type=click.INT, help="The ngram size to create blocks with.")
+@click.option("--ngram-size", default="3", show_default=True, type=NgramSizeType(), help="The ngram size to create blocks with, or 'auto' to tune it from a sample.")
+@click.option("--target-recall", default=0.99, show_default=True, type=click.FLOAT, help="The recall that --ngram-size auto must reach on the sample.")
+@click.option("--max-block-size", default=0, type=click.INT, help="Skip ngrams whose block is larger than this. 0 keeps all.")
+@click.option("--one-to-one", type=click.Choice(["greedy", "optimal"]), help="Keep at most one match per left and right record, by best score first or highest total score.")
+@click.option("--dedupe", is_flag=True, help="Compare each distinct value once, then expand the matches to rows.")
+@click.option("--memory-budget", help="Spill the ngram index to disk to stay near this size, e.g. 512MB.")
+@click.option("--checkpoint", "checkpoint_dir", help="Directory to save progress in and resume from.")
+@click.option("--score-cache", help="SQLite file to cache comparison results in across runs.")
+@click.option("--score-cache-size", default=1000000, show_default=True, type=click.INT, help="Most pairs kept in --score-cache, evicting the least recently used.")
+@click.option("--explain", is_flag=True, help="Estimate the comparisons, memory and time, then exit without joining.")
 @click.option("--no-progress", "no_progress", is_flag=True, help="Do not show comparison progress.",)
 @click.option("--debug", is_flag=True, help="Exit to PDB on exception.")
 @click.option("--yes", is_flag=True, help="Yes to all prompts.")
 @click.argument("left_csv", required=True)
 @click.argument("right_csv", required=True)
-def main(
+def join(
     fields,
     threshold,
+    thresholds,
+    threshold_outputs,
     output,
     multiples_file,
     exclude,
     collate,
     compare,
+    scorer,
     numbers_exact,
     numbers_permutation,
     numbers_subset,
     ngram_size,
+    target_recall,
+    max_block_size,
+    one_to_one,
+    dedupe,
+    memory_budget,
+    checkpoint_dir,
+    score_cache,
+    score_cache_size,
+    explain,
     no_progress,
     debug,
     yes,
     left_csv,
     right_csv,
 ):
-    """Inner join <left_csv> and <right_csv> by a fuzzy comparison of <left_field> and <right_field>."""
+    """Inner join <left_csv> and <right_csv> by a fuzzy comparison of <left_field> and <right_field>.
+
+    Parquet files (.parquet) only read <left_field> and <right_field> for the join.
+    CSV files ending in .gz, .bz2, .xz or .zst are read and written compressed.
+    SQLite tables are given as sqlite:///path.db?table=name.
+    """
+    from . import io, utils, external, compare as cmp, collate as cll
+
     try:
+        if cmp.LEVENSHTEIN_BACKEND == 'myers':
+            print("[INFO] editdistance not found. Using the pure python levenshtein.")
         collate_fn = utils.import_function(collate) if collate else None
         exclude_fn = utils.import_function(exclude) if exclude else None
         compare_fn = utils.import_function(compare) if compare else None
@@ -56,35 +131,153 @@ def main(
             field_1=field_1,
             field_2=field_2,
             threshold=threshold,
-            ngram_size=ngram_size,
+            scorer=scorer,
+            ngram_size=3 if ngram_size == "auto" else ngram_size,
+            max_block_size=max_block_size,
             collate_fn=collate_fn or cll.default_collate,
             exclude_fn=exclude_fn or cmp.default_exclude,
             compare_fn=compare_fn or cmp.default_compare,
             show_progress=not no_progress,
+            checkpoint_dir=checkpoint_dir,
+            dedupe=dedupe,
+            score_cache=score_cache,
+            score_cache_size=score_cache_size,
             numbers_exact=numbers_exact,
             numbers_permutation=numbers_permutation,
             numbers_subset=numbers_subset
         )
-        matches = io.inner_join_csv_files(left_csv, right_csv, options)
+        if memory_budget:
+            options.memory_budget = utils.parse_size(memory_budget)
+            options.blocker_fn = external.external_ngram_blocker
+        if thresholds:
+            thresholds = utils.parse_thresholds(thresholds)
+            options.threshold = thresholds[0]
+        left_records, right_records = io.load_tables(left_csv, right_csv, options)
+        if ngram_size == "auto":
+            from . import tune
+            tune.apply_tuning(left_records, right_records, options, target_recall)
+
+        if explain:
+            from . import explain as xpl
+            xpl.print_report(xpl.explain(left_records, right_records, options))
+            return
+
+        matches = cmp.inner_join(left_records, right_records, options)
+        if thresholds:
+            matches = io.fetch_matched_rows(matches, left_records, right_records)
+            io.report_thresholds(
+                matches, thresholds,
+                output=(output or "matches.csv") if threshold_outputs else None,
+                multiples_file=multiples_file if threshold_outputs else None,
+                one_to_one=one_to_one,
+                yes=yes
+            )
+            return
+
+        if one_to_one:
+            from . import assign
+            matches = assign.one_to_one(matches, one_to_one)
+        matches = io.fetch_matched_rows(matches, left_records, right_records)
 
         if output is None:
             output = "matches.csv"
 
-        if not yes:
-            utils.prompt_if_exists(output)
+        io.write_outputs(matches, output, multiples_file, yes=yes)
+    except Exception as e:
+        post_mortem(debug)
+
 
-        io.write_matches(matches, output)
-        if multiples_file:
-            multiples_matches = cmp.filter_multiples(matches)
-            if multiples_matches:
-                if not yes:
-                    utils.prompt_if_exists(multiples_file)
-                io.write_matches(multiples_matches, multiples_file)
-                print("[INFO] Wrote multiples: %s" % os.path.abspath(multiples_file))
+@main.command("batch")
+@click.option("--debug", is_flag=True, help="Exit to PDB on exception.")
+@click.option("--yes", is_flag=True, help="Yes to all prompts.")
+@click.argument("manifest_file", required=True)
+def batch(debug, yes, manifest_file):
+    """Run the joins in <manifest_file> (YAML or JSON) in one process.
 
-        print("[INFO] Wrote: %s" % os.path.abspath(output))
+    The tables and ngram indexes are loaded once and shared by the jobs.
+    """
+    from . import batch as bt
+
+    try:
+        failed = bt.run_batch(manifest_file, yes=yes)
+    except Exception as e:
+        post_mortem(debug)
+        sys.exit(1)
+
+    if failed:
+        sys.exit(1)
+
+
+@main.command("shard")
+@click.option("-f", "--fields", nargs=2, required=True, help="<left_field> <right_field>")
+@click.option("-t", "--threshold", default=0.7, show_default=True, type=click.FLOAT, help="Only return matches above this score.")
+@click.option("--shards", required=True, type=click.INT, help="Number of shards to split the join into.")
+@click.option("--by", default="rows", show_default=True, type=click.Choice(["rows", "ngrams"]), help="Split by left row range or by ngram hash partition.")
+@click.option("--out-dir", default="shards", show_default=True, help="Directory to write the shard specs and outputs to.")
+@click.option("--exclude", help="Function used to exclude records. See: <fuzzyjoin.compare.default_exclude>")
+@click.option("--collate", help="Function used to collate <fields>. See: <fuzzyjoin.collate.default_collate>")
+@click.option("--compare", help="Function used to compare records. See: <fuzzyjoin.compare.default_compare>")
+@click.option("--scorer", default="levenshtein", show_default=True, type=click.Choice(list(scorers.SCORERS)), help="Similarity of <fields>.")
+@click.option("--numbers-exact", is_flag=True, help="Numbers and order must match exactly.")
+@click.option("--numbers-permutation", is_flag=True, help="Numbers must match but may be out of order.")
+@click.option("--numbers-subset", is_flag=True, help="Numbers must be a subset.")
+@click.option("--ngram-size", default=3, show_default=True, type=click.INT, help="The ngram size to create blocks with.")
+@click.option("--max-block-size", default=0, type=click.INT, help="Skip ngrams whose block is larger than this. 0 keeps all.")
+@click.option("--dedupe", is_flag=True, help="Compare each distinct value once, then expand the matches to rows.")
+@click.option("--debug", is_flag=True, help="Exit to PDB on exception.")
+@click.argument("left_csv", required=True)
+@click.argument("right_csv", required=True)
+def shard(fields, threshold, shards, by, out_dir, debug, left_csv, right_csv, **job_options):
+    """Split the join of <left_csv> and <right_csv> into shards.
+
+    Writes a spec per shard to <out-dir> to run with `fuzzyjoin run-shard`
+    on any machine that can read the inputs, followed by `fuzzyjoin merge`.
+    """
+    from . import shard as sh
+
+    try:
+        job = dict(job_options, left=left_csv, right=right_csv, fields=list(fields), threshold=threshold)
+        sh.write_shards(job, shards, by, out_dir)
+    except Exception as e:
+        post_mortem(debug)
+        sys.exit(1)
+
+
+@main.command("run-shard")
+@click.option("--debug", is_flag=True, help="Exit to PDB on exception.")
+@click.argument("spec_file", required=True)
+def run_shard(debug, spec_file):
+    """Run the shard of <spec_file> written by `fuzzyjoin shard`."""
+    from . import shard as sh
+
+    try:
+        sh.run_shard(spec_file)
+    except Exception as e:
+        post_mortem(debug)
+        sys.exit(1)
+
+
+@main.command("merge")
+@click.option("-o", "--output", default="matches.csv", show_default=True, help="File to write the matches to (.csv or .parquet), or sqlite:///path.db?table=name.")
+@click.option("--multiples", "multiples_file", help="File for left IDs with multiple matches.")
+@click.option("--one-to-one", type=click.Choice(["greedy", "optimal"]), help="Keep at most one match per left and right record, by best score first or highest total score.")
+@click.option("--debug", is_flag=True, help="Exit to PDB on exception.")
+@click.option("--yes", is_flag=True, help="Yes to all prompts.")
+@click.argument("shard_dir", required=True)
+def merge(output, multiples_file, one_to_one, debug, yes, shard_dir):
+    """Merge the outputs of the shards in <shard_dir> and write the matches.
+
+    Pairs found by more than one shard are kept once, and multiples are
+    found across all the shards.
+    """
+    from . import io, shard as sh
+
+    try:
+        matches = sh.merge_shards(shard_dir)
+        if one_to_one:
+            from . import assign
+            matches = assign.one_to_one(matches, one_to_one)
+        io.write_outputs(matches, output, multiples_file, yes=yes)
     except Exception as e:
-        extype, value, tb = sys.exc_info()
-        traceback.print_exc()
-        if debug:
-            pdb.post_mortem(tb)
+        post_mortem(debug)
+        sys.exit(1)
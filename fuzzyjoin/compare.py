@@ -1,21 +1,28 @@
 import re
 import time
 
-from typing import NewType, Callable, List, Iterator, Dict, Set, Tuple, Any
+from typing import (
+    NewType, Callable, List, Iterator, Iterable, Dict, Set, Tuple, Any, Optional, Sequence
+)
 from collections import defaultdict
 
 try:
     import editdistance  # type: ignore
     levenshtein = editdistance.eval
+    LEVENSHTEIN_BACKEND = 'editdistance'
 
 except Exception:
-    print("[INFO]: editdistance not found. Using pylev.")
-    import pylev  # type: ignore
-    levenshtein = pylev.levenshtein
+    from .myers import levenshtein
+    LEVENSHTEIN_BACKEND = 'myers'
 
 import attr
 
 from .collate import default_collate, to_tokens
+from .utils import format_size
+from .scorers import get_scorer
+from .ngram_index import NgramIndex
+from .cache import ScoreCache, comparator_config, DEFAULT_MAX_ENTRIES
+from .checkpoint import Checkpoint, fingerprint
 
 
 Match = NewType("Match", Dict[str, Any])
@@ -65,25 +72,46 @@ def default_compare(record_1: List[Dict], record_2: List[Dict], options: Any) ->
     return results
 
 
-def ngram_blocker(table_1: List[Dict], table_2: List[Dict], options: Any):
-    field_1 = options['field_1']
+def ngram_blocker(table_1: Sequence[Dict], table_2: Sequence[Dict], options: Any):
+    """Block each `table_1` record with the `table_2` records that share one of
+    its ngrams, using a compact index of `table_2`.
+    """
     field_2 = options['field_2']
     ngram_size = options['ngram_size']
     collate_fn = options['collate_fn']
 
-    ngram_index_2 = index_by_ngrams(
+    ngram_index_2 = compact_index_by_ngrams(
         table_2, ngram_size,
         index_key=field_2,
         tx_fn=collate_fn
     )
-    blocks = []
-    for id_1, record_1 in enumerate(table_1):
-        text_1 = collate_fn(record_1[field_1])
-        for ngram in to_ngrams(text_1, ngram_size):
-            ngram_block = ngram_index_2.get(ngram, [])
-            blocks.append((id_1, ngram_block))
+    nbytes = ngram_index_2.nbytes()
+    saved = ngram_index_2.dict_nbytes() - nbytes
+    print(
+        f"[INFO] Ngram index: {len(ngram_index_2)} ngrams, {format_size(nbytes)} "
+        f"({format_size(saved)} less than a dict of sets)"
+    )
+    return block_by_candidates(table_1, ngram_index_2, options)
+
+
+def block_by_candidates(table_1: Sequence[Dict], ngram_index_2: NgramIndex, options: Any):
+    """Yield a single block for each `table_1` record, holding the distinct
+    `table_2` ids of `ngram_index_2` that share any of its ngrams, so each
+    pair is only compared once.
+
+    Blocks larger than `max_block_size` are skipped as stop ngrams, such as
+    the ngrams of very common words, unless it is 0.
+    """
+    field_1 = options['field_1']
+    ngram_size = options['ngram_size']
+    collate_fn = options['collate_fn']
+    max_block_size = options['max_block_size']
 
-    return blocks
+    for id_1, record_1 in enumerate(table_1):
+        ngrams = to_ngrams(collate_fn(record_1[field_1]), ngram_size)
+        block_ids = ngram_index_2.candidates(ngrams, max_block_size)
+        if block_ids:
+            yield id_1, block_ids
 
 
 @attr.s(auto_attribs=True)
@@ -91,17 +119,28 @@ class Options:
     field_1: str
     field_2: str
     ngram_size: int = 3
+    max_block_size: int = 0
     threshold: float = 0.7
     numbers_exact: bool = False
     numbers_permutation: bool = False
     numbers_subset: bool = False
     fuzzy_fn: Callable = levenshtein
+    scorer: str = attr.ib(default='levenshtein')
     collate_fn: Callable = default_collate
     exclude_fn: Callable = default_exclude
     compare_fn: Callable = default_compare
     blocker_fn: Callable = ngram_blocker
+    memory_budget: int = 0
+    checkpoint_dir: Optional[str] = None
+    dedupe: bool = False
+    score_cache: Optional[str] = None
+    score_cache_size: int = DEFAULT_MAX_ENTRIES
     show_progress: bool = True
 
+    @scorer.validator
+    def _check_scorer(self, attribute, value):
+        get_scorer(value)
+
     def __getitem__(self, key):
         return getattr(self, key)
 
@@ -112,33 +151,39 @@ class Options:
 def compare_fuzzy(
     record_1: List[Dict], record_2: List[Dict], options: Options
 ) -> Dict[str, Any]:
+    """Score the texts with the `scorer` of `options`.
+
+    The upper bounds of the scorer are checked first, and when one is below
+    `threshold` it is returned as the score without running the full metric.
+    """
     field_1 = options['field_1']
     field_2 = options['field_2']
     threshold = options['threshold']
-    fuzzy_fn = options['fuzzy_fn']
+    scorer = get_scorer(options['scorer'])
 
     output: Dict[str, Any] = {}
+    meta = {
+        'function': 'compare_fuzzy',
+        'threshold': threshold,
+        'scorer': scorer.name,
+    }
+    if scorer.uses_fuzzy_fn:
+        meta['fuzzy_fn'] = options['fuzzy_fn'].__name__
     text_1 = record_1[field_1]
     text_2 = record_2[field_2]
-    t1_len = len(text_1)
-    t2_len = len(text_2)
-    larger = t1_len if t1_len >= t2_len else t2_len
-    delta = fuzzy_fn(text_1, text_2)
-    if delta >= larger:
-        score = 0.0
-    else:
-        score = 1 - (delta / larger)
+    for bound_fn in scorer.bound_fns:
+        bound = bound_fn(text_1, text_2)
+        if bound < threshold:
+            meta['bound_fn'] = bound_fn.__name__
+            return {'pass': False, 'score': bound, 'meta': meta}
 
+    score = scorer.score_fn(text_1, text_2, options)
     if score >= threshold:
         output = {'pass': True, 'score': score}
     else:
         output = {'pass': False, 'score': score}
 
-    output['meta'] = {
-        'function': 'compare_fuzzy',
-        'threshold': threshold,
-        'fuzzy_fn': fuzzy_fn.__name__
-    }
+    output['meta'] = meta
     return output
 
 
@@ -220,7 +265,7 @@ def compare_numbers_subset(
 
 
 def index_by_ngrams(
-    records: List[Dict],
+    records: Sequence[Dict],
     ngram_size: int,
     index_key: str,
     tx_fn: Callable = default_collate,
@@ -234,6 +279,20 @@ def index_by_ngrams(
     return dict(index)
 
 
+def compact_index_by_ngrams(
+    records: Sequence[Dict],
+    ngram_size: int,
+    index_key: str,
+    tx_fn: Callable = default_collate,
+) -> NgramIndex:
+    """Collect the records by ngram for field `index_key` into a compact
+    `NgramIndex`, which has the same lookups as `index_by_ngrams`.
+    """
+    return NgramIndex.build(
+        to_ngrams(tx_fn(record[index_key]), ngram_size) for record in records
+    )
+
+
 def to_ngrams(item: str, ngram_size: int) -> Iterator[str]:
     """Yield the list of ngrams of size `ngram_size`of each token in `text`.
 
@@ -258,9 +317,92 @@ def token_to_ngrams(token: str, ngram_size: int) -> Iterator[str]:
         end = start + ngram_size
 
 
+def compare_block(
+    id_1: int,
+    block_ids: Iterable[int],
+    table_1: Sequence[Dict],
+    table_2: Sequence[Dict],
+    options: Dict[str, Any],
+    matched_ids: Set[Tuple[int, int]],
+    score_cache: Optional[ScoreCache] = None,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Compare record `id_1` of `table_1` with the `block_ids` records of
+    `table_2`, and return the number of comparisons and the new matches.
+
+    With `score_cache`, the results of the whole block are looked up at once
+    and only the pairs that are not cached are compared.
+    """
+    exclude_fn = options['exclude_fn']
+    compare_fn = options['compare_fn']
+    total = 0
+    matches = []
+    record_1 = table_1[id_1]
+    candidates = []
+    for id_2 in block_ids:
+        # If already matched, don't compare again. The same
+        # pairs may appear across multiple blocks.
+        if (id_1, id_2) in matched_ids:
+            continue
+
+        total += 1
+        record_2 = table_2[id_2]
+        if exclude_fn(record_1, record_2, options):
+            continue
+
+        candidates.append((id_2, record_2))
+
+    if score_cache is not None:
+        all_results = score_cache.compare_many(
+            record_1, [record_2 for _, record_2 in candidates], compare_fn, options
+        )
+    else:
+        all_results = [compare_fn(record_1, record_2, options) for _, record_2 in candidates]
+
+    for (id_2, record_2), results in zip(candidates, all_results):
+        last_result = results[-1]
+        if last_result['pass'] is True:
+            score = last_result['score']
+            match = {
+                'score': score,
+                '_id_1': id_1, 'record_1': record_1,
+                '_id_2': id_2, 'record_2': record_2
+            }
+            match['meta'] = {'match_stages': results}
+            matches.append(match)
+            matched_ids.add((id_1, id_2))
+
+    return total, matches
+
+
+def resume_checkpoint(
+    table_1: Sequence[Dict], table_2: Sequence[Dict], options: Dict[str, Any]
+) -> Tuple[Optional[Checkpoint], int, int, List[Dict[str, Any]]]:
+    """Return the checkpoint for `checkpoint_dir`, if any, and the next
+    `table_1` id, comparison count and matches to resume from.
+    """
+    if not options['checkpoint_dir']:
+        return None, 0, 0, []
+
+    checkpoint = Checkpoint(options['checkpoint_dir'], fingerprint(table_1, table_2, options))
+    start_id_1, total, matches = checkpoint.resume(table_1, table_2)
+    if start_id_1 > 0:
+        print(f"[INFO] Resuming at {start_id_1} of {len(table_1)} : {len(matches)} matches")
+
+    return checkpoint, start_id_1, total, matches
+
+
+def open_score_cache(options: Dict[str, Any]) -> Optional[ScoreCache]:
+    """Return the `ScoreCache` for `score_cache`, if any."""
+    if not options['score_cache']:
+        return None
+
+    config = comparator_config(options)
+    return ScoreCache(options['score_cache'], config, options['score_cache_size'])
+
+
 def inner_join(
-    table_1: List[Dict],
-    table_2: List[Dict],
+    table_1: Sequence[Dict],
+    table_2: Sequence[Dict],
     options: Any,
 ) -> List[Dict[str, Any]]:
     """Return only the matched record above `threshold`.
@@ -273,74 +415,170 @@ def inner_join(
 
     The default `ngram_size` is 3. Increase this value if join is too slow due
     to large block sizes.
+
+    With `checkpoint_dir`, the progress is saved periodically and a later call
+    with the same tables and options resumes from the last checkpoint. This
+    requires the blocks to be ordered by the `table_1` id, as they are from
+    the built-in blockers.
+
+    With `score_cache`, the comparison results are cached in that SQLite file
+    and reused by later joins with the same comparison options.
+
+    With `dedupe`, see `inner_join_distinct`.
     """
+    if options['dedupe']:
+        return inner_join_distinct(table_1, table_2, options)
+
     options = options.__dict__
-    exclude_fn = options['exclude_fn']
-    compare_fn = options['compare_fn']
     blocker_fn = options['blocker_fn']
     show_progress = options['show_progress']
 
-    total = 0
-    blocks = blocker_fn(table_1, table_2, options)
-
-    last_time = time.clock()
-    matches = []  # type: List[Dict[str, Any]]
-    matched_ids = set()  # type: Set[Tuple[str, str]]
-    for i, block in enumerate(blocks):
-        id_1, block_ids = block
-        record_1 = table_1[id_1]
-        for id_2 in block_ids:
-            # If already matched, don't compare again. The same
-            # pairs may appear across multiple blocks.
-            if (id_1, id_2) in matched_ids:
-                continue
-
-            total += 1
-            record_2 = table_2[id_2]
-            if exclude_fn(record_1, record_2, options):
-                continue
-
-            results = compare_fn(record_1, record_2, options)
-            last_result = results[-1]
-            if last_result['pass'] is True:
-                score = last_result['score']
-                match = {
-                    'score': score,
-                    '_id_1': id_1, 'record_1': record_1,
-                    '_id_2': id_2, 'record_2': record_2
-                }
-                match['meta'] = {'match_stages': results}
-                matches.append(match)
-                matched_ids.add((id_1, id_2))
+    checkpoint, start_id_1, total, matches = resume_checkpoint(table_1, table_2, options)
+    score_cache = open_score_cache(options)
+
+    # Blocks may be a generator, such as from an out-of-core blocker, so
+    # progress is reported by the left record position. On resume only the
+    # remaining left records are blocked, and their ids offset by `start_id_1`.
+    blocks: Iterable[Tuple[int, Any]] = []
+    if start_id_1 < len(table_1):
+        remaining_1 = table_1[start_id_1:] if start_id_1 else table_1
+        blocks = blocker_fn(remaining_1, table_2, options)
+
+    start_time = last_time = time.perf_counter()
+    matched_ids = set()  # type: Set[Tuple[int, int]]
+    id_1 = start_id_1 - 1
+    for block_id_1, block_ids in blocks:
+        if checkpoint and block_id_1 + start_id_1 != id_1:
+            # All the blocks of the previous left record are complete.
+            checkpoint.update(block_id_1 + start_id_1, total)
+
+        id_1 = block_id_1 + start_id_1
+        block_total, block_matches = compare_block(
+            id_1, block_ids, table_1, table_2, options, matched_ids, score_cache
+        )
+        total += block_total
+        matches.extend(block_matches)
+        if checkpoint:
+            checkpoint.extend(block_matches)
 
         if show_progress:
-            t = time.clock()
+            t = time.perf_counter()
             if (t - last_time) > 5:
-                print(f"[INFO] {i} of {len(blocks)} : {t:.2f}s")
+                print(f"[INFO] {id_1 + 1} of {len(table_1)} : {t - start_time:.2f}s")
                 last_time = t
 
-    t = time.clock()
-    print(f"[INFO] {i} of {len(blocks)} : {t:.2f}s")
+    if checkpoint:
+        checkpoint.save(len(table_1), total)
+        checkpoint.close()
+    if score_cache:
+        score_cache.close()
+
+    t = time.perf_counter()
+    print(f"[INFO] {id_1 + 1} of {len(table_1)} : {t - start_time:.2f}s")
     print(f"[INFO] Total comparisons: {total}")
     return matches
 
 
-def filter_multiples(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Returns the list of matches where a left table ID has
-    multiple matches in the right table.
+def group_by_value(table: Sequence[Dict], field: str) -> Tuple[List[Dict], List[List[int]]]:
+    """Group the ids of `table` by the value of `field`.
+
+    :returns: The first record of each group, and the ids of each group.
     """
-    counts: Dict[str, int] = defaultdict(lambda: 0)
+    groups: Dict[str, List[int]] = {}
+    for id, record in enumerate(table):
+        groups.setdefault(record[field], []).append(id)
+
+    group_ids = list(groups.values())
+    representatives = [table[ids[0]] for ids in group_ids]
+    return representatives, group_ids
+
+
+def expand_matches(
+    matches: List[Dict[str, Any]],
+    table_1: Sequence[Dict],
+    table_2: Sequence[Dict],
+    group_ids_1: List[List[int]],
+    group_ids_2: List[List[int]],
+    options: Any,
+) -> List[Dict[str, Any]]:
+    """Expand the matches between groups of records into matches between
+    every pair of records in the groups, ordered by the `table_1` id.
+    """
+    exclude_fn = options['exclude_fn']
+    expanded = []
     for match in matches:
-        id_1 = match["_id_1"]
-        counts[id_1] += 1
+        for id_1 in group_ids_1[match['_id_1']]:
+            record_1 = table_1[id_1]
+            for id_2 in group_ids_2[match['_id_2']]:
+                record_2 = table_2[id_2]
+                if exclude_fn(record_1, record_2, options):
+                    continue
+
+                expanded.append({
+                    'score': match['score'],
+                    '_id_1': id_1, 'record_1': record_1,
+                    '_id_2': id_2, 'record_2': record_2,
+                    'meta': match['meta']
+                })
+
+    expanded.sort(key=lambda match: match['_id_1'])
+    return expanded
+
 
-    multiples_ids = set(id for id, count in counts.items() if count > 1)
-    if len(multiples_ids) == 0:
-        return []
+def inner_join_distinct(
+    table_1: Sequence[Dict],
+    table_2: Sequence[Dict],
+    options: Any,
+) -> List[Dict[str, Any]]:
+    """Join the distinct values of both tables, and then expand the matches
+    to the records with those values.
 
-    multiples_matches = []
+    Records with the same value get the same score, so each value is blocked
+    and compared once and the matches are those of the plain join.
+    `exclude_fn` is applied to each expanded pair of records rather than the
+    first records.
+    """
+    field_1 = options['field_1']
+    field_2 = options['field_2']
+
+    distinct_1, group_ids_1 = group_by_value(table_1, field_1)
+    distinct_2, group_ids_2 = group_by_value(table_2, field_2)
+    ratio_1 = len(table_1) / max(len(distinct_1), 1)
+    ratio_2 = len(table_2) / max(len(distinct_2), 1)
+    print(f"[INFO] Distinct left values: {len(distinct_1)} of {len(table_1)} ({ratio_1:.2f}x)")
+    print(f"[INFO] Distinct right values: {len(distinct_2)} of {len(table_2)} ({ratio_2:.2f}x)")
+
+    distinct_options = attr.evolve(options, dedupe=False, exclude_fn=default_exclude)
+    matches = inner_join(distinct_1, distinct_2, distinct_options)
+    expanded = expand_matches(matches, table_1, table_2, group_ids_1, group_ids_2, options)
+    print(f"[INFO] Expanded {len(matches)} distinct matches to {len(expanded)} matches")
+    return expanded
+
+
+def threshold_sweep(
+    matches: Sequence[Dict[str, Any]], thresholds: Sequence[float]
+) -> Dict[float, List[Dict[str, Any]]]:
+    """Return the matches at each of `thresholds`, from the matches of a join
+    at the lowest of them.
+
+    A match passes a higher threshold when its score is at least that
+    threshold, which holds for the default comparison, so one join gives the
+    matches of every threshold.
+    """
+    return {
+        threshold: [match for match in matches if match['score'] >= threshold]
+        for threshold in sorted(thresholds)
+    }
+
+
+def filter_multiples(matches: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Returns the list of matches where a left table ID has
+    multiple matches in the right table.
+
+    The matches are grouped by left table ID in the order the IDs first appear.
+    """
+    groups: Dict[int, List[Dict[str, Any]]] = {}
     for match in matches:
-        if match["_id_1"] in multiples_ids:
-            multiples_matches.append(match)
+        groups.setdefault(match["_id_1"], []).append(match)
 
-    return multiples_matches
+    return [match for group in groups.values() if len(group) > 1 for match in group]
@@ -0,0 +1,141 @@
+"""Estimate the cost of a join from the right table index and a sample of the
+left table, without running the join.
+"""
+import sys
+import time
+import random
+from typing import Any, Dict, List, Sequence
+
+from . import compare
+from .utils import format_size
+
+
+# Number of left records sampled.
+SAMPLE_SIZE = 1000
+# Number of sampled record pairs timed with `compare_fn`.
+TIMED_COMPARISONS = 2000
+# Percentiles of the block size distribution to report.
+PERCENTILES = (50, 90, 99, 100)
+
+
+def percentile(values: List[int], pct: int) -> int:
+    """Return the `pct` percentile of the sorted `values`."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, (len(values) * pct) // 100)]
+
+
+def match_nbytes(match: Dict[str, Any]) -> int:
+    """Return the approximate bytes used by a match, not counting its records."""
+    nbytes = sys.getsizeof(match)
+    for stage in match['meta']['match_stages']:
+        nbytes += sys.getsizeof(stage) + sum(sys.getsizeof(v) for v in stage.values())
+
+    return nbytes + sys.getsizeof(match['meta'])
+
+
+def time_comparisons(
+    pairs: List[tuple], table_1: Sequence[Dict], table_2: Sequence[Dict], options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Time `compare_fn` over the `(id_1, id_2)` `pairs`."""
+    matched_ids: set = set()
+    matches = []
+    start_time = time.perf_counter()
+    for id_1, id_2 in pairs:
+        _, block_matches = compare.compare_block(
+            id_1, [id_2], table_1, table_2, options, matched_ids
+        )
+        matches.extend(block_matches)
+    seconds = time.perf_counter() - start_time
+    return {
+        'seconds_per_comparison': seconds / max(len(pairs), 1),
+        'match_rate': len(matches) / max(len(pairs), 1),
+        'match_bytes': match_nbytes(matches[0]) if matches else 0,
+    }
+
+
+def explain(
+    table_1: Sequence[Dict],
+    table_2: Sequence[Dict],
+    options: Any,
+    sample_size: int = SAMPLE_SIZE,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Return the estimated comparisons, memory and time of joining `table_1`
+    and `table_2` with the ngram blocker.
+
+    The right table index is built in full, and the blocks and comparisons are
+    measured for a random sample of `sample_size` left records.
+    """
+    if options['dedupe']:
+        table_1, _ = compare.group_by_value(table_1, options['field_1'])
+        table_2, _ = compare.group_by_value(table_2, options['field_2'])
+
+    options = options.__dict__
+    start_time = time.perf_counter()
+    index = compare.compact_index_by_ngrams(
+        table_2, options['ngram_size'],
+        index_key=options['field_2'],
+        tx_fn=options['collate_fn']
+    )
+    index_seconds = time.perf_counter() - start_time
+
+    rng = random.Random(seed)
+    sample_ids = sorted(rng.sample(range(len(table_1)), min(sample_size, len(table_1))))
+    sample = [table_1[id] for id in sample_ids]
+    candidates: List[List[int]] = [[] for _ in sample]
+    for id, block_ids in compare.block_by_candidates(sample, index, options):
+        candidates[id] = block_ids
+
+    pairs = [(id_1, id_2) for id_1, ids in enumerate(candidates) for id_2 in ids]
+    timing = time_comparisons(
+        rng.sample(pairs, min(TIMED_COMPARISONS, len(pairs))), sample, table_2, options
+    )
+
+    # Each candidate pair is compared once.
+    scale = len(table_1) / max(len(sample), 1)
+    est_candidates = sum(len(ids) for ids in candidates) * scale
+    est_comparisons = est_candidates
+    est_matches = est_candidates * timing['match_rate']
+    block_sizes = sorted(index.block_sizes())
+    return {
+        'left_records': len(table_1),
+        'right_records': len(table_2),
+        'sampled_records': len(sample),
+        'ngrams': len(index),
+        'block_sizes': {pct: percentile(block_sizes, pct) for pct in PERCENTILES},
+        'candidates_per_record': {
+            pct: percentile(sorted(len(ids) for ids in candidates), pct) for pct in PERCENTILES
+        },
+        'estimated_candidate_pairs': int(est_candidates),
+        'estimated_comparisons': int(est_comparisons),
+        'estimated_matches': int(est_matches),
+        'index_bytes': index.nbytes(),
+        'dict_index_bytes': index.dict_nbytes(),
+        'estimated_match_bytes': int(est_matches * timing['match_bytes']),
+        'index_seconds': index_seconds,
+        'seconds_per_comparison': timing['seconds_per_comparison'],
+        'estimated_seconds': index_seconds + est_comparisons * timing['seconds_per_comparison'],
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Print the estimates returned by `explain`."""
+    def distribution(values):
+        return ', '.join(f'p{pct}={value}' for pct, value in values.items())
+
+    print(f"[INFO] Records: left {report['left_records']}, right {report['right_records']}")
+    print(f"[INFO] Sampled left records: {report['sampled_records']}")
+    print(f"[INFO] Ngrams: {report['ngrams']}")
+    print(f"[INFO] Block sizes: {distribution(report['block_sizes'])}")
+    print(f"[INFO] Candidates per left record: {distribution(report['candidates_per_record'])}")
+    print(f"[INFO] Estimated candidate pairs: {report['estimated_candidate_pairs']}")
+    print(f"[INFO] Estimated comparisons: {report['estimated_comparisons']}")
+    print(f"[INFO] Estimated matches: {report['estimated_matches']}")
+    print(
+        f"[INFO] Index memory: {format_size(report['index_bytes'])} "
+        f"({format_size(report['dict_index_bytes'])} as a dict of sets)"
+    )
+    print(f"[INFO] Estimated match memory: {format_size(report['estimated_match_bytes'])}")
+    print(f"[INFO] Seconds per comparison: {report['seconds_per_comparison']:.2e}")
+    print(f"[INFO] Estimated time: {report['estimated_seconds']:.1f}s")
@@ -0,0 +1,275 @@
+"""Out-of-core ngram blocking for right tables whose ngram index does not
+fit in memory.
+
+The ngram postings of both tables are partitioned by a hash of the ngram
+into files on disk. Each partition of the right table is small enough to
+index in memory, and the candidate pairs found with it are sorted in runs
+that are merged and deduplicated into one block per left record.
+"""
+import os
+import heapq
+import math
+import zlib
+import random
+import tempfile
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from .compare import to_ngrams
+
+
+# Approximate bytes per posting of an in-memory `index_by_ngrams` index.
+POSTING_BYTES = 100
+# Approximate bytes per candidate pair while a run is sorted: 8 in the
+# array and 44 for the int and its slot in the sorted list.
+PAIR_BYTES = 64
+# Number of records sampled to estimate the number of postings.
+SAMPLE_SIZE = 1000
+# Number of pairs read at a time from each run while merging.
+MERGE_CHUNK_SIZE = 64 * 1024
+# Maximum number of runs open at once while merging.
+MAX_OPEN_RUNS = 256
+# Maximum number of partition files open at once while writing.
+MAX_OPEN_PARTITIONS = 256
+# Pairs are packed into a single unsigned 64 bit integer.
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+
+def ngram_partition(ngram: str, partitions: int) -> int:
+    """Return the partition of `ngram`, which is stable across processes."""
+    return zlib.crc32(ngram.encode('utf-8')) % partitions
+
+
+def estimate_postings(
+    records: Sequence[Dict], field: str, ngram_size: int, collate_fn: Callable, seed: int = 0
+) -> int:
+    """Estimate the number of postings of `records` from a random sample of them."""
+    if not records:
+        return 0
+
+    rng = random.Random(seed)
+    sample_ids = sorted(rng.sample(range(len(records)), min(SAMPLE_SIZE, len(records))))
+    sample = [records[id] for id in sample_ids]
+
+    sample_postings = sum(
+        len(set(to_ngrams(collate_fn(record[field]), ngram_size))) for record in sample
+    )
+    return math.ceil(sample_postings * len(records) / len(sample))
+
+
+def count_partitions(postings: int, memory_budget: int) -> int:
+    """Return the number of partitions for the right table so that the
+    index of each partition fits in `memory_budget`.
+    """
+    return max(1, math.ceil(postings * POSTING_BYTES / memory_budget))
+
+
+def write_partitions(
+    records: Sequence[Dict],
+    field: str,
+    ngram_size: int,
+    collate_fn: Callable,
+    partitions: int,
+    prefix: str,
+) -> List[str]:
+    """Write the `ngram<TAB>id` postings of `records` to one file per
+    partition, and return the file paths.
+
+    At most `MAX_OPEN_PARTITIONS` files are open at once, so with more
+    partitions `records` is read once per group of partitions.
+
+    Ngrams never contain whitespace since they are made from tokens.
+    """
+    filepaths = [f'{prefix}_{partition}.txt' for partition in range(partitions)]
+    for start in range(0, partitions, MAX_OPEN_PARTITIONS):
+        stop = min(start + MAX_OPEN_PARTITIONS, partitions)
+        files = [open(filepath, 'w', encoding='utf-8') for filepath in filepaths[start:stop]]
+        try:
+            for id, record in enumerate(records):
+                if id > ID_MASK:
+                    raise Exception(f"Tables are limited to {ID_MASK + 1} records.")
+                for ngram in set(to_ngrams(collate_fn(record[field]), ngram_size)):
+                    partition = ngram_partition(ngram, partitions)
+                    if start <= partition < stop:
+                        files[partition - start].write(f'{ngram}\t{id}\n')
+        finally:
+            for f in files:
+                f.close()
+
+    return filepaths
+
+
+def iter_postings(filepath: str) -> Iterator[Tuple[str, int]]:
+    """Yield each `(ngram, id)` posting of a partition file."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            ngram, id = line.rstrip('\n').split('\t')
+            yield ngram, int(id)
+
+
+def load_partition_index(filepath: str, max_block_size: int = 0) -> Dict[str, List[int]]:
+    """Collect the postings of a right table partition by ngram, dropping the
+    blocks larger than `max_block_size` unless it is 0.
+    """
+    index: Dict[str, List[int]] = {}
+    for ngram, id in iter_postings(filepath):
+        index.setdefault(ngram, []).append(id)
+
+    if max_block_size:
+        index = {k: ids for k, ids in index.items() if len(ids) <= max_block_size}
+
+    return index
+
+
+def write_run(pairs: array, filepath: str):
+    """Sort and deduplicate the packed `pairs` and write them to `filepath`."""
+    last_pair = -1
+    chunk = array('Q')
+    with open(filepath, 'wb') as out:
+        for pair in sorted(pairs):
+            if pair == last_pair:
+                continue
+            last_pair = pair
+            chunk.append(pair)
+            if len(chunk) >= MERGE_CHUNK_SIZE:
+                chunk.tofile(out)
+                chunk = array('Q')
+        chunk.tofile(out)
+
+
+def iter_run(filepath: str) -> Iterator[int]:
+    """Yield the packed pairs of a sorted run file."""
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = array('Q')
+            try:
+                chunk.fromfile(f, MERGE_CHUNK_SIZE)
+            except EOFError:
+                # `fromfile` keeps the items read before the end of the file.
+                pass
+            if not chunk:
+                break
+            yield from chunk
+
+
+def iter_candidate_runs(
+    left_filepaths: List[str],
+    right_filepaths: List[str],
+    max_pairs: int,
+    prefix: str,
+    max_block_size: int = 0,
+) -> Iterator[str]:
+    """Join the left and right postings partition by partition, writing the
+    candidate pairs in sorted runs of at most `max_pairs`, and yield the
+    run file paths.
+    """
+    run_count = 0
+    pairs = array('Q')
+    for left_filepath, right_filepath in zip(left_filepaths, right_filepaths):
+        index = load_partition_index(right_filepath, max_block_size)
+        for ngram, id_1 in iter_postings(left_filepath):
+            for id_2 in index.get(ngram, ()):
+                pairs.append(id_1 << ID_BITS | id_2)
+            if len(pairs) >= max_pairs:
+                run_filepath = f'{prefix}_{run_count}.bin'
+                write_run(pairs, run_filepath)
+                yield run_filepath
+                run_count += 1
+                pairs = array('Q')
+        del index
+
+    if pairs:
+        run_filepath = f'{prefix}_{run_count}.bin'
+        write_run(pairs, run_filepath)
+        yield run_filepath
+
+
+def merge_runs(run_filepaths: List[str], prefix: str) -> Iterator[int]:
+    """Merge the sorted runs into a single sorted stream of pairs, first merging
+    groups of runs into larger runs while there are too many to open at once.
+    """
+    merge_count = 0
+    while len(run_filepaths) > MAX_OPEN_RUNS:
+        merged_filepaths = []
+        for start in range(0, len(run_filepaths), MAX_OPEN_RUNS):
+            group = run_filepaths[start:start + MAX_OPEN_RUNS]
+            merged_filepath = f'{prefix}_{merge_count}.bin'
+            merge_count += 1
+            with open(merged_filepath, 'wb') as out:
+                chunk = array('Q')
+                for pair in heapq.merge(*[iter_run(filepath) for filepath in group]):
+                    chunk.append(pair)
+                    if len(chunk) >= MERGE_CHUNK_SIZE:
+                        chunk.tofile(out)
+                        chunk = array('Q')
+                chunk.tofile(out)
+            for filepath in group:
+                os.remove(filepath)
+            merged_filepaths.append(merged_filepath)
+        run_filepaths = merged_filepaths
+
+    return heapq.merge(*[iter_run(filepath) for filepath in run_filepaths])
+
+
+def group_pairs(pairs: Iterator[int]) -> Iterator[Tuple[int, List[int]]]:
+    """Group sorted packed `pairs` into `(id_1, [id_2, ...])` blocks,
+    skipping the duplicate pairs from different runs.
+    """
+    last_pair = -1
+    block: Tuple[int, List[int]] = (-1, [])
+    for pair in pairs:
+        if pair == last_pair:
+            continue
+
+        last_pair = pair
+        id_1 = pair >> ID_BITS
+        if id_1 != block[0]:
+            if block[1]:
+                yield block
+            block = (id_1, [])
+        block[1].append(pair & ID_MASK)
+
+    if block[1]:
+        yield block
+
+
+def external_ngram_blocker(
+    table_1: Sequence[Dict], table_2: Sequence[Dict], options: Any
+) -> Iterator[Tuple[int, List[int]]]:
+    """Yield one block of candidate `table_2` ids per `table_1` record in
+    order of the `table_1` ids, spilling the ngram postings to disk so the
+    memory used stays near `memory_budget` bytes.
+    """
+    field_1 = options['field_1']
+    field_2 = options['field_2']
+    ngram_size = options['ngram_size']
+    collate_fn = options['collate_fn']
+    memory_budget = options['memory_budget']
+    if memory_budget <= 0:
+        raise Exception("external_ngram_blocker requires a positive memory_budget.")
+
+    postings = estimate_postings(table_2, field_2, ngram_size, collate_fn)
+    partitions = count_partitions(postings, memory_budget)
+    max_pairs = max(1, memory_budget // PAIR_BYTES)
+    print(f"[INFO] Ngram partitions: {partitions}")
+    with tempfile.TemporaryDirectory(prefix='fuzzyjoin_') as temp_dir:
+        right_filepaths = write_partitions(
+            table_2, field_2, ngram_size, collate_fn, partitions,
+            prefix=os.path.join(temp_dir, 'right')
+        )
+        left_filepaths = write_partitions(
+            table_1, field_1, ngram_size, collate_fn, partitions,
+            prefix=os.path.join(temp_dir, 'left')
+        )
+        run_filepaths = list(iter_candidate_runs(
+            left_filepaths, right_filepaths, max_pairs,
+            prefix=os.path.join(temp_dir, 'run'),
+            max_block_size=options['max_block_size']
+        ))
+        for filepath in left_filepaths + right_filepaths:
+            os.remove(filepath)
+
+        print(f"[INFO] Candidate runs: {len(run_filepaths)}")
+        pairs = merge_runs(run_filepaths, prefix=os.path.join(temp_dir, 'merge'))
+        yield from group_pairs(pairs)
@@ -1,9 +1,241 @@
+import os
 import csv
-from typing import List, Any, Dict
+import bisect
+import sqlite3
+from urllib.parse import parse_qs
+from typing import List, Any, Dict, Optional, Sequence, Iterator, Tuple
 
 from . import compare, utils
 
 
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+SQLITE_PREFIX = 'sqlite:///'
+# Rows read per `fetchmany` and ids per `IN (...)` query, below SQLite's parameter limit.
+SQLITE_FETCH_SIZE = 500
+# Rows written per `executemany`.
+SQLITE_WRITE_SIZE = 10000
+
+
+def import_pyarrow():
+    """Import `pyarrow` and `pyarrow.parquet`, which are optional
+    dependencies installed with `pip install fuzzyjoin[parquet]`.
+    """
+    try:
+        import pyarrow  # type: ignore
+        import pyarrow.parquet  # type: ignore
+    except ImportError:
+        raise Exception("Parquet support requires pyarrow: pip install fuzzyjoin[parquet]")
+
+    return pyarrow, pyarrow.parquet
+
+
+def is_parquet(filepath: str) -> bool:
+    return os.path.splitext(filepath)[1].lower() in PARQUET_EXTENSIONS
+
+
+def to_text(value: Any) -> str:
+    """Return a join column value as text, with `''` for a missing value."""
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
+
+
+class ParquetRecords(Sequence):
+    """Records of a Parquet file holding only the `columns` needed for the join.
+
+    The join columns are read as text, where null is `''` and other values use
+    `str`. The full rows are read by row index with `fetch_rows` once the
+    matches are known, so the remaining columns are never parsed for the row
+    groups without a match.
+    """
+
+    def __init__(self, filepath: str, columns: List[str]):
+        _, pq = import_pyarrow()
+        self.filepath = filepath
+        self.columns = list(dict.fromkeys(columns))
+        table = pq.read_table(filepath, columns=self.columns)
+        self._values = [
+            [to_text(value) for value in table.column(column).to_pylist()]
+            for column in self.columns
+        ]
+        self._length = table.num_rows
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, id):
+        if isinstance(id, slice):
+            return [self[i] for i in range(*id.indices(self._length))]
+        return {column: values[id] for column, values in zip(self.columns, self._values)}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in zip(*self._values):
+            yield dict(zip(self.columns, row))
+
+    def fetch_rows(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Return the complete rows for `ids` in the same order, reading only
+        the row groups that hold them.
+        """
+        pa, pq = import_pyarrow()
+        parquet_file = pq.ParquetFile(self.filepath)
+        starts = [0]
+        for group in range(parquet_file.num_row_groups):
+            starts.append(starts[-1] + parquet_file.metadata.row_group(group).num_rows)
+
+        id_groups = [bisect.bisect_right(starts, id) - 1 for id in ids]
+        groups = sorted(set(id_groups))
+        # The start of each row group within the table of the row groups read.
+        read_starts = {}
+        read_rows = 0
+        for group in groups:
+            read_starts[group] = read_rows
+            read_rows += starts[group + 1] - starts[group]
+
+        positions = [read_starts[group] + id - starts[group] for id, group in zip(ids, id_groups)]
+        table = parquet_file.read_row_groups(groups)
+        return table.take(pa.array(positions, type=pa.int64())).to_pylist()
+
+
+def is_sqlite(uri: str) -> bool:
+    return uri.startswith(SQLITE_PREFIX)
+
+
+def parse_sqlite_uri(uri: str) -> Tuple[str, str]:
+    """Return the database path and table of `sqlite:///path.db?table=name`.
+
+    As with SQLAlchemy, `sqlite:///data.db` is relative and `sqlite:////data.db` is absolute.
+    """
+    path, _, query = uri[len(SQLITE_PREFIX):].partition('?')
+    tables = parse_qs(query).get('table')
+    if not path or not tables:
+        raise Exception(f"Expected sqlite:///path.db?table=name, not: {uri}")
+
+    return path, tables[0]
+
+
+def resolve_path(path: str, base_dir: str) -> str:
+    """Return `path`, or the database path of a SQLite URI, relative to `base_dir`."""
+    if is_sqlite(path):
+        db_path, _, query = path[len(SQLITE_PREFIX):].partition('?')
+        return f'{SQLITE_PREFIX}{os.path.join(base_dir, db_path)}?{query}'
+
+    return os.path.join(base_dir, path)
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteRecords(Sequence):
+    """Records of a SQLite table holding only the `columns` needed for the join.
+
+    The columns are streamed from a cursor along with the `rowid`, and the full
+    rows are selected by `rowid` with `fetch_rows` once the matches are known.
+    The join columns are read as text, where NULL is `''` and numbers use `str`.
+    """
+
+    def __init__(self, uri: str, columns: List[str]):
+        self.path, self.table = parse_sqlite_uri(uri)
+        if not os.path.exists(self.path):
+            raise Exception(f"SQLite database not found: {self.path}")
+
+        self.columns = list(dict.fromkeys(columns))
+        selected = ', '.join(quote_identifier(column) for column in self.columns)
+        self._rowids: List[int] = []
+        self._values: List[Tuple] = []
+        with sqlite3.connect(self.path) as conn:
+            cursor = conn.execute(
+                f"SELECT rowid, {selected} FROM {quote_identifier(self.table)} ORDER BY rowid"
+            )
+            rows = cursor.fetchmany(SQLITE_FETCH_SIZE)
+            while rows:
+                for row in rows:
+                    self._rowids.append(row[0])
+                    self._values.append(tuple(to_text(value) for value in row[1:]))
+                rows = cursor.fetchmany(SQLITE_FETCH_SIZE)
+
+    def __len__(self) -> int:
+        return len(self._rowids)
+
+    def __getitem__(self, id):
+        if isinstance(id, slice):
+            return [self[i] for i in range(*id.indices(len(self)))]
+        return dict(zip(self.columns, self._values[id]))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for values in self._values:
+            yield dict(zip(self.columns, values))
+
+    def fetch_rows(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """Return the complete rows for `ids` in the same order."""
+        rowids = sorted({self._rowids[id] for id in ids})
+        rows = {}
+        with sqlite3.connect(self.path) as conn:
+            conn.row_factory = sqlite3.Row
+            for start in range(0, len(rowids), SQLITE_FETCH_SIZE):
+                batch = rowids[start:start + SQLITE_FETCH_SIZE]
+                cursor = conn.execute(
+                    f"SELECT rowid AS _rowid, * FROM {quote_identifier(self.table)} "
+                    f"WHERE rowid IN ({','.join('?' * len(batch))})", batch
+                )
+                for row in cursor:
+                    record = dict(row)
+                    rows[record.pop('_rowid')] = record
+
+        return [rows[self._rowids[id]] for id in ids]
+
+
+def load_records(filepath: str, columns: List[str]) -> Sequence[Dict[str, Any]]:
+    """Load the records of `filepath` for a join on `columns`.
+
+    Parquet files and SQLite URIs only read `columns`, while CSV files,
+    optionally compressed, load complete rows.
+    """
+    if is_sqlite(filepath):
+        return SqliteRecords(filepath, columns)
+    if is_parquet(filepath):
+        return ParquetRecords(filepath, columns)
+
+    return utils.load_csv_as_records(filepath)
+
+
+def fetch_matched_rows(
+    matches: List[Dict[str, Any]], table_1: Sequence[Dict], table_2: Sequence[Dict]
+) -> List[Dict[str, Any]]:
+    """Replace the partial records of `matches` with the complete rows from
+    tables that only loaded the join columns.
+    """
+    sides = ((table_1, '_id_1', 'record_1'), (table_2, '_id_2', 'record_2'))
+    for table, id_key, record_key in sides:
+        if not hasattr(table, 'fetch_rows'):
+            continue
+
+        rows = table.fetch_rows([match[id_key] for match in matches])  # type: ignore
+        for match, row in zip(matches, rows):
+            match[record_key] = row
+
+    return matches
+
+
+def load_tables(
+    left_file: str, right_file: str, options: Any
+) -> Tuple[Sequence[Dict[str, Any]], Sequence[Dict[str, Any]]]:
+    """Load the tables from CSV or Parquet files or SQLite URIs `left_file` and `right_file`."""
+    left_records = load_records(left_file, [options['field_1']])
+    right_records = load_records(right_file, [options['field_2']])
+
+    return left_records, right_records
+
+
+def inner_join_files(left_file: str, right_file: str, options: Any) -> List[Dict[str, Any]]:
+    """Load the tables from CSV or Parquet files `left_file` and `right_file`,
+    pass them into `compare.inner_join` and fetch the complete matched rows.
+    """
+    left_records, right_records = load_tables(left_file, right_file, options)
+    matches = compare.inner_join(left_records, right_records, options)
+    return fetch_matched_rows(matches, left_records, right_records)
+
+
 def inner_join_csv_files(left_file: str, right_file: str, options: Any) -> List[Dict[str, Any]]:
     """Load the tables from files `left_file` and `right_file` and
     then pass them into `compare.inner_join`.
@@ -13,16 +245,185 @@ def inner_join_csv_files(left_file: str, right_file: str, options: Any) -> List[
     return compare.inner_join(left_records, right_records, options)
 
 
-def write_matches(matches: List[compare.Match], output_file: str):
-    """Collapse the matches into a single table."""
-    with open(output_file, 'w') as out:
+def matches_to_rows(matches: Sequence[Dict[str, Any]]) -> Iterator[List[Any]]:
+    """Yield the header followed by one row per match."""
+    header_1 = list(matches[0]['record_1'].keys())
+    header_2 = list(matches[0]['record_2'].keys())
+    yield ['score'] + header_1 + header_2
+    for match in matches:
+        score = match['score']
+        record_1 = list(match['record_1'].values())
+        record_2 = list(match['record_2'].values())
+        yield [score] + record_1 + record_2
+
+
+def write_matches(matches: Sequence[Dict[str, Any]], output_file: str):
+    """Collapse the matches into a single table. CSV files are compressed
+    according to their extension, such as `matches.csv.gz`.
+    """
+    if is_sqlite(output_file):
+        return write_matches_sqlite(matches, output_file)
+    if is_parquet(output_file):
+        return write_matches_parquet(matches, output_file)
+
+    with utils.open_text(output_file, 'w') as out:
         csv_writer = csv.writer(out, lineterminator='\n')
-        header_1 = list(matches[0]['record_1'].keys())
-        header_2 = list(matches[0]['record_2'].keys())
-        header = ['score'] + header_1 + header_2
-        csv_writer.writerow(header)
-        for match in matches:
-            score = match['score']
-            record_1 = list(match['record_1'].values())
-            record_2 = list(match['record_2'].values())
-            csv_writer.writerow([score] + record_1 + record_2)
+        for row in matches_to_rows(matches):
+            csv_writer.writerow(row)
+
+
+def disambiguate_header(header: List[str]) -> List[str]:
+    """Suffix repeated column names with `_1`, `_2`, ... in the order they appear."""
+    counts: Dict[str, int] = {}
+    for name in header:
+        counts[name] = counts.get(name, 0) + 1
+
+    seen: Dict[str, int] = {}
+    new_header = []
+    for name in header:
+        if counts[name] > 1:
+            seen[name] = seen.get(name, 0) + 1
+            name = f'{name}_{seen[name]}'
+        new_header.append(name)
+
+    return new_header
+
+
+def write_matches_parquet(matches: Sequence[Dict[str, Any]], output_file: str):
+    """Collapse the matches into a single Parquet table. Parquet readers reject
+    duplicate column names, so the names shared by both tables are suffixed.
+    """
+    pa, pq = import_pyarrow()
+    rows = matches_to_rows(matches)
+    header = disambiguate_header(next(rows))
+    columns = list(zip(*rows))
+    arrays = [pa.array(column) for column in columns]
+    table = pa.Table.from_arrays(arrays, names=header)
+    pq.write_table(table, output_file)
+
+
+def write_matches_sqlite(matches: Sequence[Dict[str, Any]], uri: str):
+    """Replace the table of the SQLite `uri` with the matches in a single
+    transaction. The column names shared by both tables are suffixed.
+    """
+    path, table = parse_sqlite_uri(uri)
+    rows = matches_to_rows(matches)
+    header = disambiguate_header(next(rows))
+    columns = ', '.join(quote_identifier(column) for column in header)
+    insert = (
+        f"INSERT INTO {quote_identifier(table)} ({columns}) "
+        f"VALUES ({', '.join('?' * len(header))})"
+    )
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+            conn.execute(f"CREATE TABLE {quote_identifier(table)} ({columns})")
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= SQLITE_WRITE_SIZE:
+                    conn.executemany(insert, batch)
+                    batch = []
+            conn.executemany(insert, batch)
+    finally:
+        conn.close()
+
+
+def threshold_output(output: str, threshold: float) -> str:
+    """Return `output` with `threshold` added to the file or SQLite table name,
+    such as `matches_0.8.csv.gz` or `sqlite:///data.db?table=matches_0_8`.
+    """
+    if is_sqlite(output):
+        path, table = parse_sqlite_uri(output)
+        suffix = str(threshold).replace('.', '_')
+        return f'{SQLITE_PREFIX}{path}?table={table}_{suffix}'
+
+    directory, filename = os.path.split(output)
+    stem, dot, extensions = filename.partition('.')
+    return os.path.join(directory, f'{stem}_{threshold}{dot}{extensions}')
+
+
+def output_exists(output: str) -> bool:
+    """Return whether the file or SQLite table `output` exists."""
+    if not is_sqlite(output):
+        return os.path.exists(output)
+
+    path, table = parse_sqlite_uri(output)
+    if not os.path.exists(path):
+        return False
+
+    conn = sqlite3.connect(path)
+    try:
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+        return conn.execute(query, (table,)).fetchone() is not None
+    finally:
+        conn.close()
+
+
+def prompt_if_exists(output: str):
+    """Prompt the user if the file or SQLite table `output` already exists."""
+    if output_exists(output):
+        resp = input(f"[WARN] <{output}> already exists. Overwrite it? [y|N]: ")
+        if resp not in "yY":
+            raise Exception("User aborted.")
+
+
+def output_path(output: str) -> str:
+    return output if is_sqlite(output) else os.path.abspath(output)
+
+
+def write_outputs(
+    matches: Sequence[Dict[str, Any]],
+    output_file: str,
+    multiples_file: Optional[str] = None,
+    yes: bool = False,
+):
+    """Write `matches` to `output_file`, and the matches of left IDs with multiple
+    matches to `multiples_file`. Prompt before overwriting files unless `yes`.
+    """
+    if not yes:
+        prompt_if_exists(output_file)
+
+    write_matches(matches, output_file)
+    if multiples_file:
+        multiples_matches = compare.filter_multiples(matches)
+        if multiples_matches:
+            if not yes:
+                prompt_if_exists(multiples_file)
+            write_matches(multiples_matches, multiples_file)
+            print("[INFO] Wrote multiples: %s" % output_path(multiples_file))
+
+    print("[INFO] Wrote: %s" % output_path(output_file))
+
+
+def report_thresholds(
+    matches: Sequence[Dict[str, Any]],
+    thresholds: Sequence[float],
+    output: Optional[str] = None,
+    multiples_file: Optional[str] = None,
+    one_to_one: Optional[str] = None,
+    yes: bool = False,
+):
+    """Print the number of matches and of left IDs with multiple matches at
+    each of `thresholds`, given the matches of a join at the lowest threshold.
+
+    With `output`, the matches at each threshold are written to `output` and
+    `multiples_file` with the threshold added to their names.
+    """
+    for threshold, selected in compare.threshold_sweep(matches, thresholds).items():
+        if one_to_one:
+            from . import assign
+            selected = assign.one_to_one(selected, one_to_one)
+        multiple_ids = {match['_id_1'] for match in compare.filter_multiples(selected)}
+        print(
+            f"[INFO] Threshold {threshold}: {len(selected)} matches, "
+            f"{len(multiple_ids)} left IDs with multiple matches"
+        )
+        if output and selected:
+            write_outputs(
+                selected,
+                threshold_output(output, threshold),
+                threshold_output(multiples_file, threshold) if multiples_file else None,
+                yes=yes
+            )
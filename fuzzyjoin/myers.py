@@ -0,0 +1,55 @@
+"""Pure python Levenshtein distance with Myers' bit-parallel algorithm, in
+the form given by Hyyrö, used when `editdistance` is not installed.
+
+A column of the edit distance matrix is held as bit vectors of the vertical
+differences between its cells, in python ints of the length of the longer
+text. Each character of the shorter text updates the whole column with a
+fixed number of integer operations rather than a loop over the longer text.
+"""
+from typing import Dict, Optional
+
+
+def levenshtein(text_1: str, text_2: str, max_distance: Optional[int] = None) -> int:
+    """Return the Levenshtein distance between `text_1` and `text_2`.
+
+    With `max_distance`, stop as soon as the distance must exceed it and
+    return `max_distance + 1`.
+    """
+    if len(text_1) < len(text_2):
+        text_1, text_2 = text_2, text_1
+    length_1, length_2 = len(text_1), len(text_2)
+    if max_distance is not None and length_1 - length_2 > max_distance:
+        return max_distance + 1
+    if length_2 == 0:
+        return length_1
+
+    # The positions of each character in the longer text.
+    positions: Dict[str, int] = {}
+    for i, char in enumerate(text_1):
+        positions[char] = positions.get(char, 0) | (1 << i)
+
+    mask = (1 << length_1) - 1
+    last = 1 << (length_1 - 1)
+    # Vertical positive and negative differences of the current column.
+    pv, mv = mask, 0
+    distance = length_1
+    for j, char in enumerate(text_2, 1):
+        eq = positions.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            distance += 1
+        elif mh & last:
+            distance -= 1
+
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        # The distance falls by at most one per remaining character.
+        if max_distance is not None and distance - (length_2 - j) > max_distance:
+            return max_distance + 1
+
+    return distance
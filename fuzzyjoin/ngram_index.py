@@ -0,0 +1,109 @@
+"""A compact ngram index with the lookups of a `Dict[str, Set[int]]`.
+
+Each ngram is given an integer id by a vocabulary, and the sorted record ids
+of every ngram are stored in one contiguous `array('I')` of postings, where
+the postings of ngram id `i` are `postings[offsets[i]:offsets[i + 1]]`.
+This avoids a set and boxed ints per ngram, and the candidates of a record
+are the union of the postings of its ngrams.
+"""
+import sys
+import functools
+import itertools
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List
+
+
+class NgramIndex(Mapping):
+    """The record ids by ngram in compressed sparse row layout."""
+
+    def __init__(self, vocabulary: Dict[str, int], offsets: array, postings: array):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+
+    @classmethod
+    def build(cls, ngram_lists: Iterable[Iterable[str]]) -> 'NgramIndex':
+        """Index the ngrams of each record, given in record id order."""
+        vocabulary: Dict[str, int] = {}
+        pair_ngram_ids = array('I')
+        pair_ids = array('I')
+        for id, ngrams in enumerate(ngram_lists):
+            for ngram in dict.fromkeys(ngrams):
+                pair_ngram_ids.append(vocabulary.setdefault(ngram, len(vocabulary)))
+                pair_ids.append(id)
+
+        # Count the postings of each ngram, and then place the record ids,
+        # which arrive in order, so each run of postings is sorted.
+        counts = [0] * (len(vocabulary) + 1)
+        for ngram_id in pair_ngram_ids:
+            counts[ngram_id + 1] += 1
+        offsets = array('Q', itertools.accumulate(counts))
+        postings = array('I', bytes(pair_ids.itemsize * len(pair_ids)))
+        next_positions = array('Q', offsets[:-1])
+        for ngram_id, id in zip(pair_ngram_ids, pair_ids):
+            postings[next_positions[ngram_id]] = id
+            next_positions[ngram_id] += 1
+
+        return cls(vocabulary, offsets, postings)
+
+    def __getitem__(self, ngram: str) -> array:
+        ngram_id = self.vocabulary[ngram]
+        return self.postings[self.offsets[ngram_id]:self.offsets[ngram_id + 1]]
+
+    def __contains__(self, ngram) -> bool:
+        return ngram in self.vocabulary
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.vocabulary)
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+    def block_sizes(self) -> List[int]:
+        """Return the number of postings of each ngram."""
+        return [stop - start for start, stop in zip(self.offsets, self.offsets[1:])]
+
+    def candidates(self, ngrams: Iterable[str], max_block_size: int = 0) -> List[int]:
+        """Return the sorted distinct record ids that share an ngram with
+        `ngrams`, skipping ngrams with more than `max_block_size` records
+        unless it is 0.
+
+        The postings are merged with a set union, which runs in C and is
+        several times faster than a python merge of the sorted runs.
+        """
+        postings = memoryview(self.postings)
+        runs = []
+        for ngram in dict.fromkeys(ngrams):
+            ngram_id = self.vocabulary.get(ngram)
+            if ngram_id is None:
+                continue
+            start, stop = self.offsets[ngram_id], self.offsets[ngram_id + 1]
+            if max_block_size and stop - start > max_block_size:
+                continue
+            runs.append(postings[start:stop])
+
+        if len(runs) == 1:
+            return runs[0].tolist()
+
+        return sorted(set().union(*runs))
+
+    def nbytes(self) -> int:
+        """Return the approximate bytes used by the index."""
+        nbytes = sys.getsizeof(self.vocabulary) + sum(sys.getsizeof(k) for k in self.vocabulary)
+        for values in (self.offsets, self.postings):
+            nbytes += sys.getsizeof(values)
+        return nbytes
+
+    def dict_nbytes(self) -> int:
+        """Return the approximate bytes the same index would use as a dict of
+        sets, not counting the record ids shared between the sets.
+        """
+        nbytes = sys.getsizeof(self.vocabulary)
+        nbytes += sum(sys.getsizeof(k) for k in self.vocabulary)
+        return nbytes + sum(set_nbytes(size) for size in self.block_sizes())
+
+
+@functools.lru_cache(maxsize=None)
+def set_nbytes(size: int) -> int:
+    return sys.getsizeof(set(range(size)))
@@ -0,0 +1,220 @@
+"""Similarity scorers for `compare_fuzzy`, selected by `Options.scorer`.
+
+Each scorer returns a similarity between 0.0 and 1.0 along with cheap upper
+bounds on it, from the lengths or character histograms of the texts. The
+bounds are checked against `threshold` in order, so the full metric is only
+computed for pairs that could still pass.
+
+A bound is only registered when checking it costs less than the time it
+saves, measured with `python tasks.py bench-scorers`. The histogram bound
+takes longer than levenshtein itself, so it is only used for the slower
+scorers.
+"""
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+import attr
+
+from . import myers
+from .collate import to_sorted_tokens
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Scorer:
+    name: str
+    # (text_1, text_2, options) -> similarity
+    score_fn: Callable[[str, str, Any], float]
+    # (text_1, text_2) -> upper bound of the similarity, cheapest first,
+    # each cheaper than `score_fn`.
+    bound_fns: Tuple[Callable[[str, str], float], ...] = ()
+    # Whether `score_fn` computes distances with `Options.fuzzy_fn`.
+    uses_fuzzy_fn: bool = False
+
+
+SCORERS: Dict[str, Scorer] = {}
+
+
+def register_scorer(scorer: Scorer) -> Scorer:
+    SCORERS[scorer.name] = scorer
+    return scorer
+
+
+def get_scorer(name: str) -> Scorer:
+    if name not in SCORERS:
+        raise Exception(f"Unknown scorer: {name}. Choose from: {', '.join(SCORERS)}")
+    return SCORERS[name]
+
+
+def distance_ratio(distance: int, length_1: int, length_2: int) -> float:
+    """Return the edit `distance` normalized by the longer length as a similarity."""
+    larger = max(length_1, length_2)
+    if larger == 0:
+        return 1.0
+    if distance >= larger:
+        return 0.0
+    return 1 - (distance / larger)
+
+
+def length_bound(text_1: str, text_2: str) -> float:
+    """Edits are needed for at least the difference in length. O(1)."""
+    return distance_ratio(abs(len(text_1) - len(text_2)), len(text_1), len(text_2))
+
+
+def histogram_bound(text_1: str, text_2: str) -> float:
+    """Each insertion, deletion, substitution or transposition fixes at most
+    one extra character on each side of the character histograms. O(n).
+    """
+    counts = Counter(text_1)
+    counts.subtract(text_2)
+    extra_1 = sum(count for count in counts.values() if count > 0)
+    extra_2 = -sum(count for count in counts.values() if count < 0)
+    return distance_ratio(max(extra_1, extra_2), len(text_1), len(text_2))
+
+
+def levenshtein_score(text_1: str, text_2: str, options: Any) -> float:
+    fuzzy_fn = options['fuzzy_fn']
+    larger = max(len(text_1), len(text_2))
+    if fuzzy_fn is myers.levenshtein and larger:
+        # Stop once the score must be below the threshold, allowing for rounding.
+        max_distance = int((1 - options['threshold']) * larger + 1e-6)
+        distance = fuzzy_fn(text_1, text_2, max_distance=max_distance)
+    else:
+        distance = fuzzy_fn(text_1, text_2)
+    return distance_ratio(distance, len(text_1), len(text_2))
+
+
+def osa_distance(text_1: str, text_2: str) -> int:
+    """Optimal string alignment distance: Levenshtein plus transpositions of
+    adjacent characters, where no substring is edited more than once.
+    """
+    previous: List[int] = []
+    row = list(range(len(text_2) + 1))
+    for i, char_1 in enumerate(text_1, 1):
+        before, previous, row = previous, row, [i] + [0] * len(text_2)
+        for j, char_2 in enumerate(text_2, 1):
+            cost = 0 if char_1 == char_2 else 1
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_1 == text_2[j - 2] and text_1[i - 2] == char_2:
+                row[j] = min(row[j], before[j - 2] + 1)
+
+    return row[-1]
+
+
+def damerau_score(text_1: str, text_2: str, options: Any) -> float:
+    return distance_ratio(osa_distance(text_1, text_2), len(text_1), len(text_2))
+
+
+def jaro(text_1: str, text_2: str) -> float:
+    len_1, len_2 = len(text_1), len(text_2)
+    if len_1 == 0 or len_2 == 0:
+        return 1.0 if len_1 == len_2 else 0.0
+
+    window = max(max(len_1, len_2) // 2 - 1, 0)
+    used_2 = [False] * len_2
+    matched_1 = []
+    for i, char in enumerate(text_1):
+        for j in range(max(0, i - window), min(len_2, i + window + 1)):
+            if not used_2[j] and text_2[j] == char:
+                used_2[j] = True
+                matched_1.append(char)
+                break
+
+    matches = len(matched_1)
+    if matches == 0:
+        return 0.0
+
+    matched_2 = [char for j, char in enumerate(text_2) if used_2[j]]
+    transpositions = sum(a != b for a, b in zip(matched_1, matched_2)) / 2
+    return (matches / len_1 + matches / len_2 + (matches - transpositions) / matches) / 3
+
+
+# Winkler's prefix scale and longest rewarded common prefix.
+WINKLER_SCALE = 0.1
+WINKLER_PREFIX = 4
+
+
+def winkler(jaro_score: float, prefix: int) -> float:
+    return jaro_score + min(prefix, WINKLER_PREFIX) * WINKLER_SCALE * (1 - jaro_score)
+
+
+def common_prefix(text_1: str, text_2: str) -> int:
+    """Return the length of the common prefix, up to `WINKLER_PREFIX`."""
+    prefix = 0
+    for char_1, char_2 in zip(text_1[:WINKLER_PREFIX], text_2[:WINKLER_PREFIX]):
+        if char_1 != char_2:
+            break
+        prefix += 1
+
+    return prefix
+
+
+def jaro_winkler_score(text_1: str, text_2: str, options: Any) -> float:
+    return winkler(jaro(text_1, text_2), common_prefix(text_1, text_2))
+
+
+def jaro_winkler_bound(text_1: str, text_2: str, matches: int) -> float:
+    """The score with `matches` matching characters and no transpositions."""
+    if not text_1 or not text_2:
+        return 1.0 if text_1 == text_2 else 0.0
+    if matches == 0:
+        return 0.0
+    jaro_score = (matches / len(text_1) + matches / len(text_2) + 1) / 3
+    return winkler(jaro_score, common_prefix(text_1, text_2))
+
+
+def jaro_winkler_length_bound(text_1: str, text_2: str) -> float:
+    """At most the shorter length of characters match. O(1)."""
+    return jaro_winkler_bound(text_1, text_2, min(len(text_1), len(text_2)))
+
+
+def jaro_winkler_histogram_bound(text_1: str, text_2: str) -> float:
+    """At most the common characters of the histograms match. O(n)."""
+    common = sum((Counter(text_1) & Counter(text_2)).values())
+    return jaro_winkler_bound(text_1, text_2, common)
+
+
+def token_sort_score(text_1: str, text_2: str, options: Any) -> float:
+    """The Levenshtein similarity of the texts with their tokens sorted."""
+    sorted_1 = ' '.join(to_sorted_tokens(text_1))
+    sorted_2 = ' '.join(to_sorted_tokens(text_2))
+    return levenshtein_score(sorted_1, sorted_2, options)
+
+
+def token_sort_bound(text_1: str, text_2: str) -> float:
+    """The length bound of the texts with their tokens joined by single spaces. O(n)."""
+    len_1 = len(' '.join(text_1.split()))
+    len_2 = len(' '.join(text_2.split()))
+    return distance_ratio(abs(len_1 - len_2), len_1, len_2)
+
+
+def token_set_parts(text_1: str, text_2: str) -> Tuple[str, str, str]:
+    """Return the sorted common tokens, followed by the sorted tokens only in
+    `text_1` and those only in `text_2`.
+    """
+    tokens_1, tokens_2 = set(text_1.split()), set(text_2.split())
+    common = ' '.join(sorted(tokens_1 & tokens_2))
+    only_1 = ' '.join([common] + sorted(tokens_1 - tokens_2)).strip()
+    only_2 = ' '.join([common] + sorted(tokens_2 - tokens_1)).strip()
+    return common, only_1, only_2
+
+
+def token_set_score(text_1: str, text_2: str, options: Any) -> float:
+    """The best Levenshtein similarity between the common tokens and the common
+    tokens followed by the tokens only in either text.
+    """
+    common, only_1, only_2 = token_set_parts(text_1, text_2)
+    return max(
+        levenshtein_score(common, only_1, options) if common else 0.0,
+        levenshtein_score(common, only_2, options) if common else 0.0,
+        levenshtein_score(only_1, only_2, options),
+    )
+
+
+register_scorer(Scorer('levenshtein', levenshtein_score, (length_bound,), uses_fuzzy_fn=True))
+register_scorer(Scorer('damerau', damerau_score, (length_bound, histogram_bound)))
+register_scorer(Scorer(
+    'jaro-winkler', jaro_winkler_score, (jaro_winkler_length_bound, jaro_winkler_histogram_bound)
+))
+register_scorer(Scorer('token-sort', token_sort_score, (token_sort_bound,), uses_fuzzy_fn=True))
+# Finding the token set parts is most of the work, so it has no bound.
+register_scorer(Scorer('token-set', token_set_score, uses_fuzzy_fn=True))
@@ -0,0 +1,175 @@
+"""Split a join into independent shards that can run on separate machines,
+and merge their results.
+
+`write_shards` writes one JSON spec per shard. Each shard is run with
+`run_shard`, which only reads the input files and writes its matches as JSON
+lines of `{"score", "_id_1", "_id_2"}`. `merge_shards` combines the shard
+outputs, removing the pairs found by more than one shard.
+
+Shards split the work either `by` left row range, or by ngram hash partition
+where each shard only indexes and blocks on its own share of the ngrams.
+"""
+import os
+import json
+import glob
+import functools
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from . import io, batch, compare, external
+
+
+SHARD_METHODS = ('rows', 'ngrams')
+
+
+def shard_name(shard: int, shards: int) -> str:
+    return f'shard-{shard:03d}-of-{shards:03d}'
+
+
+def row_range_blocker(
+    table_1: Sequence[Dict], table_2: Sequence[Dict], options: Any,
+    shard: int, shards: int, blocker_fn=compare.ngram_blocker
+) -> Iterator[Tuple[int, Any]]:
+    """Block only the left records in the `shard` of `shards` equal row ranges."""
+    start = len(table_1) * shard // shards
+    stop = len(table_1) * (shard + 1) // shards
+    for id_1, block_ids in blocker_fn(table_1[start:stop], table_2, options):
+        yield id_1 + start, block_ids
+
+
+def ngram_partition_blocker(
+    table_1: Sequence[Dict], table_2: Sequence[Dict], options: Any, shard: int, shards: int
+):
+    """Index and block only the ngrams in partition `shard` of `shards`."""
+    ngram_size = options['ngram_size']
+    collate_fn = options['collate_fn']
+    index = compare.NgramIndex.build(
+        [
+            ngram for ngram in compare.to_ngrams(collate_fn(record[options['field_2']]), ngram_size)
+            if external.ngram_partition(ngram, shards) == shard
+        ]
+        for record in table_2
+    )
+    return compare.block_by_candidates(table_1, index, options)
+
+
+def shard_blocker(options: compare.Options, shard: int, shards: int, by: str):
+    """Return the blocker for `shard`. The blockers are `functools.partial`
+    objects so the checkpoint fingerprint is stable across processes.
+    """
+    if by == 'rows':
+        return functools.partial(
+            row_range_blocker, shard=shard, shards=shards, blocker_fn=options.blocker_fn
+        )
+    if by == 'ngrams':
+        return functools.partial(ngram_partition_blocker, shard=shard, shards=shards)
+
+    raise Exception(f"Unknown shard method: {by}. Choose from: {', '.join(SHARD_METHODS)}")
+
+
+def write_shards(job: Dict[str, Any], shards: int, by: str, out_dir: str) -> List[str]:
+    """Write a spec for each of the `shards` of `job`, a job of a batch manifest,
+    to `out_dir` and return their paths.
+    """
+    if by not in SHARD_METHODS:
+        raise Exception(f"Unknown shard method: {by}. Choose from: {', '.join(SHARD_METHODS)}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    job = dict(job)
+    for key in ('left', 'right'):
+        job[key] = io.resolve_path(job[key], os.getcwd())
+
+    spec_files = []
+    for shard in range(shards):
+        name = shard_name(shard, shards)
+        spec = {'job': job, 'shard': shard, 'shards': shards, 'by': by, 'output': name + '.jsonl'}
+        spec_file = os.path.join(out_dir, name + '.json')
+        with open(spec_file, 'w') as f:
+            json.dump(spec, f, indent=2)
+        spec_files.append(spec_file)
+
+    print(f"[INFO] Wrote {shards} shard specs to: {os.path.abspath(out_dir)}")
+    return spec_files
+
+
+def load_spec(spec_file: str) -> Dict[str, Any]:
+    """Load a shard spec with its paths resolved relative to the spec."""
+    with open(spec_file, 'r') as f:
+        spec = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(spec_file))
+    job = dict(batch.JOB_DEFAULTS, **spec['job'])
+    for key in batch.PATH_KEYS:
+        if job.get(key) is not None:
+            job[key] = io.resolve_path(job[key], base_dir)
+    spec['job'] = job
+    spec['output'] = os.path.join(base_dir, spec['output'])
+    return spec
+
+
+def run_shard(spec_file: str) -> int:
+    """Run the shard of `spec_file` and return the number of matches.
+
+    The output is written to a temporary file and renamed when complete, so
+    an output only exists for a finished shard.
+    """
+    spec = load_spec(spec_file)
+    job = spec['job']
+    options = batch.job_options(job)
+    options.blocker_fn = shard_blocker(options, spec['shard'], spec['shards'], spec['by'])
+    print(f"[INFO] Shard {spec['shard'] + 1} of {spec['shards']} by {spec['by']}")
+
+    left_records = io.load_records(job['left'], [options.field_1])
+    right_records = io.load_records(job['right'], [options.field_2])
+    matches = compare.inner_join(left_records, right_records, options)
+
+    temp_file = spec['output'] + '.tmp'
+    with open(temp_file, 'w') as out:
+        for match in matches:
+            row = {'score': match['score'], '_id_1': match['_id_1'], '_id_2': match['_id_2']}
+            out.write(json.dumps(row) + '\n')
+    os.replace(temp_file, spec['output'])
+    print(f"[INFO] Wrote {len(matches)} matches: {spec['output']}")
+    return len(matches)
+
+
+def load_shard_matches(shard_dir: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Return the job of the shards in `shard_dir` and their matches without
+    duplicate pairs, ordered by `(_id_1, _id_2)`.
+    """
+    spec_files = sorted(glob.glob(os.path.join(shard_dir, 'shard-*-of-*.json')))
+    if not spec_files:
+        raise Exception(f"No shard specs found in: {shard_dir}")
+
+    specs = [load_spec(spec_file) for spec_file in spec_files]
+    missing = [spec['output'] for spec in specs if not os.path.exists(spec['output'])]
+    if missing:
+        raise Exception(f"Shards have not finished: {', '.join(missing)}")
+
+    pairs: Dict[Tuple[int, int], float] = {}
+    found = 0
+    for spec in specs:
+        with open(spec['output'], 'r') as f:
+            for line in f:
+                row = json.loads(line)
+                pairs[(row['_id_1'], row['_id_2'])] = row['score']
+                found += 1
+
+    print(f"[INFO] Merged {found} shard matches into {len(pairs)} distinct pairs")
+    matches = [
+        {'score': score, '_id_1': id_1, '_id_2': id_2}
+        for (id_1, id_2), score in sorted(pairs.items())
+    ]
+    return specs[0]['job'], matches
+
+
+def merge_shards(shard_dir: str) -> List[Dict[str, Any]]:
+    """Return the matches of the shards in `shard_dir` with their complete rows."""
+    job, matches = load_shard_matches(shard_dir)
+    field_1, field_2 = job['fields']
+    left_records = io.load_records(job['left'], [field_1])
+    right_records = io.load_records(job['right'], [field_2])
+    for match in matches:
+        match['record_1'] = left_records[match['_id_1']]
+        match['record_2'] = right_records[match['_id_2']]
+
+    return io.fetch_matched_rows(matches, left_records, right_records)
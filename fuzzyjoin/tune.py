@@ -0,0 +1,234 @@
+"""Choose the ngram size and stop ngram cutoff from a sample of both tables.
+
+The comparisons of each configuration are measured on a random sample of
+both tables. Random right records rarely match the left sample of a large
+table, so the recall is measured on a second right sample of the records
+that share the most ngrams with the left sample. Every pair of records in
+that sample is compared to find the true matches.
+"""
+import heapq
+import math
+import random
+import itertools
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import attr
+
+from . import compare
+
+
+# Ngram sizes to evaluate.
+NGRAM_SIZES = (2, 3, 4, 5)
+# Largest block kept, as a fraction of the right records, or None to keep all.
+MAX_BLOCK_RATIOS = (None, 0.1, 0.02)
+# Number of records sampled from each table.
+LEFT_SAMPLE_SIZE = 200
+RIGHT_SAMPLE_SIZE = 2000
+# Ngrams of more left sample records than this are not counted when ranking
+# the likely matches.
+COMMON_NGRAM_SIZE = 20
+# Fewer sampled matches than this make the recall unreliable.
+MIN_SAMPLE_MATCHES = 10
+
+
+def sample_records(table: Sequence[Dict], size: int, rng: random.Random) -> List[Dict]:
+    ids = sorted(rng.sample(range(len(table)), min(size, len(table))))
+    return [table[id] for id in ids]
+
+
+def likely_matches(
+    sample_1: Sequence[Dict], table_2: Sequence[Dict], options: Any, size: int
+) -> List[Dict]:
+    """Return about `size` records of `table_2` that share the most ngrams of
+    the smallest of `NGRAM_SIZES` with the records of `sample_1`.
+
+    Each right record is ranked for the left record it shares the most ngrams
+    with, and an equal share of `size` is kept for each left record.
+    """
+    ngram_size = min(NGRAM_SIZES)
+    collate_fn = options['collate_fn']
+    field_2 = options['field_2']
+    index_1 = compare.index_by_ngrams(
+        sample_1, ngram_size, index_key=options['field_1'], tx_fn=collate_fn
+    )
+    # Ngrams common to many left records say little about which they match.
+    index_1 = {ngram: ids for ngram, ids in index_1.items() if len(ids) <= COMMON_NGRAM_SIZE}
+    per_record = max(1, size // max(len(sample_1), 1))
+    # The `(shared ngrams, id_2)` of the best right records of each left record.
+    best: Dict[int, List[Tuple[int, int]]] = {}
+    for id_2, record_2 in enumerate(table_2):
+        ngrams = set(compare.to_ngrams(collate_fn(record_2[field_2]), ngram_size))
+        counts = Counter(itertools.chain.from_iterable(
+            index_1.get(ngram, ()) for ngram in ngrams
+        ))
+        if not counts:
+            continue
+
+        id_1, shared = counts.most_common(1)[0]
+        heap = best.setdefault(id_1, [])
+        if len(heap) < per_record:
+            heapq.heappush(heap, (shared, id_2))
+        elif shared > heap[0][0]:
+            heapq.heapreplace(heap, (shared, id_2))
+
+    ids_2 = sorted(id_2 for heap in best.values() for _, id_2 in heap)
+    return [table_2[id] for id in ids_2]
+
+
+def exhaustive_matches(
+    table_1: Sequence[Dict], table_2: Sequence[Dict], options: Dict[str, Any]
+) -> Set[Tuple[int, int]]:
+    """Compare every pair of records and return the matching `(id_1, id_2)`."""
+    matched_ids: Set[Tuple[int, int]] = set()
+    all_ids_2 = range(len(table_2))
+    for id_1 in range(len(table_1)):
+        compare.compare_block(id_1, all_ids_2, table_1, table_2, options, matched_ids)
+
+    return matched_ids
+
+
+def evaluate(
+    table_1: Sequence[Dict],
+    index_2: compare.NgramIndex,
+    match_index_2: compare.NgramIndex,
+    true_pairs: Set[Tuple[int, int]],
+    options: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Return the comparisons of blocking `table_1` with `index_2`, of a random
+    right sample, and the recall of `true_pairs` blocking it with
+    `match_index_2`, of the right sample of likely matches.
+
+    The blocks of likely matches are not a fair sample of the block sizes, so
+    the stop ngrams are those with blocks in `index_2` above `max_block_size`.
+    """
+    comparisons = 0
+    for _, block_ids in compare.block_by_candidates(table_1, index_2, options):
+        comparisons += len(block_ids)
+
+    max_block_size = options['max_block_size']
+    stop_ngrams = {
+        ngram for ngram, size in zip(index_2, index_2.block_sizes())
+        if max_block_size and size > max_block_size
+    }
+    candidates: Set[Tuple[int, int]] = set()
+    for id_1, record_1 in enumerate(table_1):
+        ngrams = compare.to_ngrams(
+            options['collate_fn'](record_1[options['field_1']]), options['ngram_size']
+        )
+        block_ids = match_index_2.candidates(n for n in ngrams if n not in stop_ngrams)
+        candidates.update((id_1, id_2) for id_2 in block_ids)
+
+    recall = len(true_pairs & candidates) / len(true_pairs) if true_pairs else 1.0
+    return {
+        'comparisons': comparisons,
+        'candidate_pairs': len(candidates),
+        'recall': recall,
+    }
+
+
+def tune(
+    table_1: Sequence[Dict],
+    table_2: Sequence[Dict],
+    options: Any,
+    target_recall: float = 0.99,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Return the fastest `ngram_size` and `max_block_size` that reach
+    `target_recall` on a sample of the tables, or the configuration with the
+    best recall if none do, along with the measurements of every configuration.
+    """
+    rng = random.Random(seed)
+    sample_1 = sample_records(table_1, LEFT_SAMPLE_SIZE, rng)
+    sample_2 = sample_records(table_2, RIGHT_SAMPLE_SIZE, rng)
+    if len(table_2) > RIGHT_SAMPLE_SIZE:
+        match_sample_2 = likely_matches(sample_1, table_2, options, RIGHT_SAMPLE_SIZE)
+    else:
+        match_sample_2 = sample_2
+    true_pairs = exhaustive_matches(sample_1, match_sample_2, options.__dict__)
+    if len(true_pairs) < MIN_SAMPLE_MATCHES:
+        print(f"[WARN] Only {len(true_pairs)} matches in the sample. Recall is unreliable.")
+
+    # Scale the sample comparisons up to the full tables.
+    scale = (len(table_1) / max(len(sample_1), 1)) * (len(table_2) / max(len(sample_2), 1))
+    results = []
+    for ngram_size in NGRAM_SIZES:
+        index_2, match_index_2 = [
+            compare.compact_index_by_ngrams(
+                sample, ngram_size, index_key=options['field_2'], tx_fn=options['collate_fn']
+            )
+            for sample in (sample_2, match_sample_2)
+        ]
+        for ratio in MAX_BLOCK_RATIOS:
+            trial = attr.evolve(
+                options,
+                ngram_size=ngram_size,
+                max_block_size=max_block_size(ratio, len(sample_2))
+            )
+            result = evaluate(sample_1, index_2, match_index_2, true_pairs, trial.__dict__)
+            result.update({
+                'ngram_size': ngram_size,
+                'max_block_ratio': ratio,
+                'estimated_comparisons': int(result['comparisons'] * scale),
+            })
+            results.append(result)
+
+    passing = [r for r in results if r['recall'] >= target_recall]
+    if passing:
+        best = min(passing, key=lambda r: (r['comparisons'], -r['recall']))
+    else:
+        print(f"[WARN] No configuration reached a recall of {target_recall}.")
+        best = max(results, key=lambda r: (r['recall'], -r['comparisons']))
+
+    return {
+        'ngram_size': best['ngram_size'],
+        'max_block_size': max_block_size(best['max_block_ratio'], len(table_2)),
+        'best': best,
+        'sample_matches': len(true_pairs),
+        'results': results,
+    }
+
+
+def max_block_size(ratio: Optional[float], right_records: int) -> int:
+    """Return the `max_block_size` for `ratio` of the right records, 0 for all."""
+    if ratio is None:
+        return 0
+    return max(1, math.ceil(ratio * right_records))
+
+
+def print_report(report: Dict[str, Any]):
+    """Print the measurements and the choice returned by `tune`."""
+    print(f"[INFO] Tuning sample matches: {report['sample_matches']}")
+    for r in report['results']:
+        ratio = 'all' if r['max_block_ratio'] is None else f"{r['max_block_ratio']:.0%}"
+        print(
+            f"[INFO] ngram_size={r['ngram_size']} max_block={ratio:>4} : "
+            f"recall={r['recall']:.3f} comparisons~{r['estimated_comparisons']}"
+        )
+    best = report['best']
+    print(
+        f"[INFO] Chose ngram_size={report['ngram_size']} "
+        f"max_block_size={report['max_block_size'] or 'all'} : "
+        f"recall={best['recall']:.3f} comparisons~{best['estimated_comparisons']}"
+    )
+
+
+def apply_tuning(
+    table_1: Sequence[Dict], table_2: Sequence[Dict], options: Any, target_recall: float
+) -> Any:
+    """Tune `options` in place for the tables, print the report and return it.
+
+    The options are left unchanged when the sample has too few matches.
+    """
+    report = tune(table_1, table_2, options, target_recall=target_recall)
+    print_report(report)
+    if report['sample_matches'] < MIN_SAMPLE_MATCHES:
+        print(
+            f"[WARN] Keeping ngram_size={options.ngram_size} "
+            f"max_block_size={options.max_block_size or 'all'}."
+        )
+        return report
+
+    options.ngram_size = report['ngram_size']
+    options.max_block_size = report['max_block_size']
+    return report
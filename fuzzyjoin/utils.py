@@ -1,20 +1,60 @@
+import io
 import os
 import csv
 import sys
 import inspect
+import functools
 import importlib
 from typing import Iterator, Dict, List, Any, Optional
 
-import colorama  # type: ignore
 
-colorama.init(autoreset=True)
+# Read and write buffer for data files.
+BUFFER_SIZE = 1024 * 1024
+# Compressed file extensions and the module that opens them.
+COMPRESSION_MODULES = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'lzma',
+    '.zst': 'zstandard',
+}
+
+
+def compression_module(filepath: str):
+    """Return the module that opens `filepath` by extension,
+    or None if it is not compressed.
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    module_name = COMPRESSION_MODULES.get(ext)
+    if module_name is None:
+        return None
+
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        raise Exception(f"Opening <{filepath}> requires {module_name}: pip install {module_name}")
+
+
+def open_text(filepath: str, mode: str = "r", buffer_size: int = BUFFER_SIZE):
+    """Open `filepath` in text `mode` ('r' or 'w') through a `buffer_size` buffer,
+    decompressing or compressing it when it has a compressed extension.
+    """
+    binary_mode = mode.replace("t", "") + "b"
+    module = compression_module(filepath)
+    if module is None:
+        stream = open(filepath, binary_mode, buffering=buffer_size)
+    elif "r" in mode:
+        stream = io.BufferedReader(module.open(filepath, binary_mode), buffer_size)
+    else:
+        stream = io.BufferedWriter(module.open(filepath, binary_mode), buffer_size)
+
+    return io.TextIOWrapper(stream, newline="")
 
 
 def iter_csv_as_records(filepath: str) -> Iterator[Dict[str, str]]:
     """Yield each line of `filepath` as a dict using
     the first line as the keys.
     """
-    with open(filepath, "r") as f:
+    with open_text(filepath, "r") as f:
         csv_reader = csv.reader(f)
         header = next(csv_reader)
         for row in csv_reader:
@@ -29,6 +69,57 @@ def load_csv_as_records(filepath: str) -> List[Dict[str, str]]:
     return records
 
 
+# Multipliers for the size suffixes accepted by `parse_size`.
+SIZE_UNITS = {
+    'B': 1,
+    'KB': 1024,
+    'MB': 1024 ** 2,
+    'GB': 1024 ** 3,
+    'TB': 1024 ** 4,
+}
+
+
+def parse_size(text: str) -> int:
+    """Return the number of bytes in `text` such as `512MB`, `2GB` or `1024`."""
+    value = text.strip().upper().replace(' ', '')
+    if value and value[-1] in 'KMGT':
+        value += 'B'
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * SIZE_UNITS[unit])
+
+    return int(value)
+
+
+def format_size(nbytes: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if nbytes < 1024:
+            return f'{nbytes:.1f}{unit}'
+        nbytes /= 1024
+    return f'{nbytes:.1f}TB'
+
+
+def parse_thresholds(text: str) -> List[float]:
+    """Return the sorted distinct thresholds in `text` such as `0.6,0.7,0.8`."""
+    thresholds = sorted({float(value) for value in text.split(',') if value.strip()})
+    if not thresholds:
+        raise Exception(f"No thresholds in: {text}")
+    return thresholds
+
+
+def parse_ngram_size(value: Any) -> Any:
+    """Return `value` as a positive ngram size, or 'auto'."""
+    if value == 'auto':
+        return value
+    try:
+        ngram_size = int(value)
+    except (TypeError, ValueError):
+        ngram_size = 0
+    if ngram_size < 1 or str(ngram_size) != str(value).strip():
+        raise Exception(f"Invalid ngram size: {value}. Use a positive integer or 'auto'.")
+    return ngram_size
+
+
 def prompt_if_exists(filepath: str):
     """Prompt the user if `filepath` already exists."""
     if os.path.exists(filepath):
@@ -49,7 +140,16 @@ def append_to_stack(stack: List[Any], item: Any, size: int) -> List[Any]:
     return stack
 
 
+@functools.lru_cache(maxsize=None)
+def import_colorama():
+    """Import and initialize colorama on first use to keep the CLI startup fast."""
+    import colorama  # type: ignore
+    colorama.init(autoreset=True)
+    return colorama
+
+
 def color_red(text: str) -> str:
+    colorama = import_colorama()
     return colorama.Fore.RED + text + colorama.Fore.RESET
 
 
@@ -11,7 +11,6 @@ with open('VERSION') as version_file:
 
 requirements = [
     'Click>=7.0,<8.0',
-    'pylev>=1.3.0,<1.4.0'
 ]
 
 test_requirements = [
@@ -36,7 +35,10 @@ setup(
         ]
     },
     extras_require={
-        'fast': ["editdistance>=0.5.3,<0.6.0"]
+        'fast': ["editdistance>=0.5.3,<0.6.0"],
+        'parquet': ["pyarrow>=1.0.0"],
+        'zstd': ["zstandard>=0.14.0"],
+        'batch': ["PyYAML>=5.1"]
     },
     include_package_data=True,
     install_requires=requirements,
@@ -2,6 +2,8 @@
 import os
 import re
 import sys
+import time
+import random
 import shutil
 import subprocess
 from pathlib import Path
@@ -81,6 +83,59 @@ def create_names_sample(sample_count):
     print(f'[INFO] Wrote file: {out_file}')
 
 
+def bench_levenshtein(pair_count):
+    import pylev
+    from fuzzyjoin import myers
+
+    f = faker.Faker()
+    faker.Faker.seed(0)
+    names = [f.name() for _ in range(pair_count)]
+    pairs = list(zip(names, random.Random(0).sample(names, len(names))))
+    backends = [('pylev', pylev.levenshtein), ('myers', myers.levenshtein)]
+    try:
+        import editdistance
+        backends.append(('editdistance', editdistance.eval))
+    except ImportError:
+        pass
+
+    expected = [pylev.levenshtein(a, b) for a, b in pairs]
+    for name, fn in backends:
+        start_time = time.perf_counter()
+        distances = [fn(a, b) for a, b in pairs]
+        seconds = time.perf_counter() - start_time
+        assert distances == expected, f'{name} distances differ from pylev'
+        print(f'[INFO] {name:>12}: {seconds:.3f}s for {pair_count} pairs')
+
+
+def bench_scorers(pair_count):
+    import attr
+    from fuzzyjoin import compare, scorers
+
+    f = faker.Faker()
+    faker.Faker.seed(0)
+    names = [compare.default_collate(f.company()) for _ in range(pair_count)]
+    pairs = [
+        ({'name': a}, {'name': b})
+        for a, b in zip(names, random.Random(0).sample(names, len(names)))
+    ]
+    for name, scorer in list(scorers.SCORERS.items()):
+        options = compare.Options(field_1='name', field_2='name', scorer=name)
+        try:
+            # Time the scorer with no bounds, and then with each added in turn.
+            for count in range(len(scorer.bound_fns) + 1):
+                scorers.SCORERS[name] = attr.evolve(scorer, bound_fns=scorer.bound_fns[:count])
+                start_time = time.perf_counter()
+                for record_1, record_2 in pairs:
+                    compare.compare_fuzzy(record_1, record_2, options)
+                seconds = time.perf_counter() - start_time
+                bounds = ', '.join(fn.__name__ for fn in scorer.bound_fns[:count]) or 'no bounds'
+                print(f'[INFO] {name:>12}: {seconds:.3f}s with {bounds}')
+        finally:
+            scorers.SCORERS[name] = scorer
+
+    print(f'[INFO] {pair_count} pairs with {compare.LEVENSHTEIN_BACKEND} levenshtein')
+
+
 #########
 ## CLI ##
 #########
@@ -99,6 +154,18 @@ def cmd_create_sample(sample_type, sample_count):
         create_names_sample(sample_count)
 
 
+@click.command('bench-levenshtein')
+@click.argument('pair_count', type=click.INT, default=20000)
+def cmd_bench_levenshtein(pair_count):
+    bench_levenshtein(pair_count)
+
+
+@click.command('bench-scorers')
+@click.argument('pair_count', type=click.INT, default=20000)
+def cmd_bench_scorers(pair_count):
+    bench_scorers(pair_count)
+
+
 @click.command('bump')
 @click.argument('version_part', type=click.Choice(['major', 'minor', 'patch']))
 def cmd_bump(version_part):
@@ -150,6 +217,8 @@ tasks_cli.add_command(cmd_build)
 tasks_cli.add_command(cmd_publish)
 tasks_cli.add_command(cmd_create_sample)
 tasks_cli.add_command(cmd_bump)
+tasks_cli.add_command(cmd_bench_levenshtein)
+tasks_cli.add_command(cmd_bench_scorers)
 
 if __name__ == '__main__':
     tasks_cli()
@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture
+def demo_records():
+    return [
+        {"id": 1, "text": "a hello world"},
+        {"id": 2, "text": "hella"},
+        {"id": 3, "text": "zzzz"},
+    ]
@@ -0,0 +1,77 @@
+from fuzzyjoin import assign, compare
+
+
+def make_matches(pairs):
+    return [
+        {"score": score, "_id_1": id_1, "_id_2": id_2, "meta": {}}
+        for id_1, id_2, score in pairs
+    ]
+
+
+def pairs_of(matches):
+    return [(m["_id_1"], m["_id_2"]) for m in matches]
+
+
+def test_conflict_components():
+    matches = make_matches([(0, 0, 0.9), (1, 0, 0.8), (1, 1, 0.7), (2, 2, 0.9)])
+    components = assign.conflict_components(matches)
+    assert [pairs_of(c) for c in components] == [[(0, 0), (1, 0), (1, 1)]]
+
+
+def test_greedy_takes_best_scores_first():
+    matches = make_matches([(0, 0, 0.9), (0, 1, 0.8), (1, 0, 0.85), (2, 1, 0.7)])
+    assert pairs_of(assign.one_to_one(matches, "greedy")) == [(0, 0), (2, 1)]
+
+
+def test_optimal_maximizes_total_score():
+    matches = make_matches([(0, 0, 0.9), (0, 1, 0.8), (1, 0, 0.85)])
+    assert pairs_of(assign.one_to_one(matches, "greedy")) == [(0, 0)]
+    assert pairs_of(assign.one_to_one(matches, "optimal")) == [(0, 1), (1, 0)]
+
+
+def test_optimal_more_left_than_right():
+    matches = make_matches([(0, 0, 0.9), (1, 0, 0.95), (2, 0, 0.7), (2, 1, 0.6)])
+    assert pairs_of(assign.one_to_one(matches, "optimal")) == [(1, 0), (2, 1)]
+
+
+def best_total(matches, taken_1=frozenset(), taken_2=frozenset()):
+    if not matches:
+        return 0.0
+    first, rest = matches[0], matches[1:]
+    best = best_total(rest, taken_1, taken_2)
+    if first["_id_1"] not in taken_1 and first["_id_2"] not in taken_2:
+        best = max(best, first["score"] + best_total(
+            rest, taken_1 | {first["_id_1"]}, taken_2 | {first["_id_2"]}
+        ))
+    return best
+
+
+def test_optimal_matches_brute_force():
+    import random
+    rng = random.Random(0)
+    for _ in range(50):
+        pairs = {(rng.randint(0, 4), rng.randint(0, 4)) for _ in range(rng.randint(1, 10))}
+        scores = [0.7, 0.8, 0.9, rng.random()]
+        matches = make_matches([(i, j, rng.choice(scores)) for i, j in pairs])
+        assigned = assign.optimal_assign(matches)
+        assert len({m["_id_1"] for m in assigned}) == len(assigned)
+        assert len({m["_id_2"] for m in assigned}) == len(assigned)
+        assert abs(sum(m["score"] for m in assigned) - best_total(matches)) < 1e-9
+
+
+def test_optimal_long_chain():
+    # Each left record matches its right record and the next, one component.
+    pairs = [(i, i, 0.9) for i in range(2000)] + [(i, i + 1, 0.95) for i in range(2000)]
+    assigned = assign.optimal_assign(make_matches(pairs))
+    assert len(assigned) == 2000
+    assert abs(sum(m["score"] for m in assigned) - 2000 * 0.95) < 1e-6
+
+
+def test_one_to_one_join():
+    records = [{"text": "hello world"}, {"text": "hello worlds"}, {"text": "zzzz"}]
+    options = compare.Options(field_1="text", field_2="text", show_progress=False)
+    matches = compare.inner_join(records, records, options)
+    assert len(compare.filter_multiples(matches)) == 4
+    assigned = assign.one_to_one(matches, "optimal")
+    assert pairs_of(assigned) == [(0, 0), (1, 1), (2, 2)]
+    assert compare.filter_multiples(assigned) == []
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from fuzzyjoin import batch, cli, compare
+
+
+def write_demo(filepath):
+    filepath.write_text("id,text\n1,a hello world\n2,hella\n3,zzzz\n")
+
+
+def test_manifest_jobs_apply_defaults_and_paths(tmp_path):
+    manifest = {
+        "defaults": {"threshold": 0.9},
+        "jobs": [
+            {"left": "a.csv", "right": "b.csv", "fields": ["text", "text"]},
+            {"left": "c.csv", "right": "b.csv", "fields": ["text", "text"], "threshold": 0.5},
+        ],
+    }
+    jobs = batch.manifest_jobs(manifest, str(tmp_path))
+    assert jobs[0]["threshold"] == 0.9
+    assert jobs[1]["threshold"] == 0.5
+    assert jobs[0]["left"] == str(tmp_path / "a.csv")
+    assert jobs[0]["multiples"] is None
+
+    with pytest.raises(Exception):
+        batch.manifest_jobs({"jobs": [{"left": "a.csv", "thresold": 0.5}]}, str(tmp_path))
+
+
+def test_run_batch_shares_index(tmp_path, monkeypatch):
+    write_demo(tmp_path / "left.csv")
+    write_demo(tmp_path / "right.csv")
+    manifest = {
+        "defaults": {"fields": ["text", "text"], "right": "right.csv", "show_progress": False},
+        "jobs": [
+            {"left": "left.csv", "output": "out_1.csv", "threshold": 0.8},
+            {"left": "left.csv", "output": "out_2.csv", "threshold": 0.1, "multiples": "m.csv"},
+        ],
+    }
+    manifest_file = tmp_path / "manifest.json"
+    manifest_file.write_text(json.dumps(manifest))
+
+    calls = []
+    compact_index_by_ngrams = compare.compact_index_by_ngrams
+
+    def counting_index_by_ngrams(*args, **kwargs):
+        calls.append(1)
+        return compact_index_by_ngrams(*args, **kwargs)
+
+    monkeypatch.setattr(compare, "compact_index_by_ngrams", counting_index_by_ngrams)
+    assert batch.run_batch(str(manifest_file), yes=True) == 0
+    assert len(calls) == 1
+    assert len((tmp_path / "out_1.csv").read_text().splitlines()) == 4
+    assert len((tmp_path / "out_2.csv").read_text().splitlines()) == 6
+    assert (tmp_path / "m.csv").exists()
+
+
+def test_join_cache_keys_csv_by_file(tmp_path):
+    write_demo(tmp_path / "left.csv")
+    cache = batch.JoinCache()
+    left = str(tmp_path / "left.csv")
+    assert cache.records(left, "text") is cache.records(left, "id")
+    assert batch.table_key(left, "text") == batch.table_key(left, "id")
+    assert batch.table_key("a.parquet", "text") != batch.table_key("a.parquet", "id")
+
+    cache.retain({batch.table_key(left, "id")})
+    assert len(cache.tables) == 1
+
+
+def test_cli_runs_join_without_command(tmp_path):
+    write_demo(tmp_path / "left.csv")
+    output = tmp_path / "matches.csv"
+    runner = CliRunner()
+    result = runner.invoke(cli.main, [
+        "--yes", "--no-progress", "-f", "text", "text", "-o", str(output),
+        str(tmp_path / "left.csv"), str(tmp_path / "left.csv")
+    ])
+    assert result.exit_code == 0
+    assert len(output.read_text().splitlines()) == 4
+
+
+def test_cli_rejects_bad_ngram_size(tmp_path):
+    write_demo(tmp_path / "left.csv")
+    result = CliRunner().invoke(cli.main, [
+        "--yes", "--ngram-size", "three", "-f", "text", "text",
+        str(tmp_path / "left.csv"), str(tmp_path / "left.csv")
+    ])
+    assert result.exit_code == 2
+    assert "Invalid ngram size: three" in result.output
+
+
+def test_job_options_rejects_bad_ngram_size(tmp_path):
+    manifest = {"jobs": [{"left": "a.csv", "right": "b.csv", "fields": ["text", "text"],
+                          "ngram_size": "three"}]}
+    job = batch.manifest_jobs(manifest, str(tmp_path))[0]
+    with pytest.raises(Exception, match="Invalid ngram size"):
+        batch.job_options(job)
+
+
+def test_cli_batch_yaml(tmp_path):
+    pytest.importorskip("yaml")
+    write_demo(tmp_path / "left.csv")
+    (tmp_path / "manifest.yaml").write_text(
+        "jobs:\n"
+        "  - left: left.csv\n"
+        "    right: left.csv\n"
+        "    fields: [text, text]\n"
+        "    output: out.csv\n"
+    )
+    result = CliRunner().invoke(cli.main, ["batch", "--yes", str(tmp_path / "manifest.yaml")])
+    assert result.exit_code == 0
+    assert (tmp_path / "out.csv").exists()
@@ -0,0 +1,47 @@
+from fuzzyjoin import cache, compare
+
+
+def test_inner_join_reuses_cached_scores(tmp_path, demo_records):
+    records = demo_records + [{"id": 4, "text": "world of hellos"}]
+    options = compare.Options(field_1="text", field_2="text", threshold=0.1, show_progress=False)
+    expected = compare.inner_join(records, records, options)
+
+    calls = []
+
+    def counting_compare(record_1, record_2, options):
+        calls.append((record_1["id"], record_2["id"]))
+        return compare.default_compare(record_1, record_2, options)
+
+    options.compare_fn = counting_compare
+    options.score_cache = str(tmp_path / "scores.db")
+    first = compare.inner_join(records, records, options)
+    scored = len(calls)
+    assert scored > 0
+
+    second = compare.inner_join(records, records, options)
+    assert len(calls) == scored
+    for matches in (first, second):
+        assert [(m["_id_1"], m["_id_2"], m["score"]) for m in matches] == \
+            [(m["_id_1"], m["_id_2"], m["score"]) for m in expected]
+
+    # Other comparison options don't reuse the cached scores.
+    options.threshold = 0.2
+    compare.inner_join(records, records, options)
+    assert len(calls) == 2 * scored
+
+
+def test_evicts_least_recently_used(tmp_path, demo_records):
+    options = compare.Options(field_1="text", field_2="text").__dict__
+    path = str(tmp_path / "scores.db")
+    records = demo_records + [{"id": 4, "text": "world of hellos"}]
+
+    score_cache = cache.ScoreCache(path, "config", max_entries=2)
+    score_cache.compare_many(records[0], records, compare.default_compare, options)
+    score_cache.compare_many(records[0], records[2:], compare.default_compare, options)
+    assert (score_cache.hits, score_cache.misses) == (2, 4)
+    score_cache.close()
+
+    score_cache = cache.ScoreCache(path, "config", max_entries=2)
+    keys = [score_cache.key(records[0]["text"], record["text"]) for record in records]
+    assert set(score_cache.get_many(keys)) == set(keys[2:])
+    score_cache.close()
@@ -0,0 +1,63 @@
+import pytest
+
+from fuzzyjoin import checkpoint, compare
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_fingerprint_changes_with_options_and_tables(demo_records):
+    options = compare.Options(field_1="text", field_2="text").__dict__
+    records = demo_records + [{"id": 4, "text": "world of hellos"}]
+    base = checkpoint.fingerprint(records, records, options)
+    copies = [dict(record) for record in records]
+    assert base == checkpoint.fingerprint(records, copies, dict(options))
+    assert base != checkpoint.fingerprint(records, records[:3], options)
+    assert base != checkpoint.fingerprint(records, records, dict(options, threshold=0.5))
+    assert base == checkpoint.fingerprint(records, records, dict(options, show_progress=False))
+
+
+def test_resume_after_interruption(tmp_path, monkeypatch, demo_records):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_INTERVAL", 0.0)
+    records = demo_records + [{"id": 4, "text": "world of hellos"}]
+    options = compare.Options(field_1="text", field_2="text", threshold=0.1, show_progress=False)
+    expected = compare.inner_join(records, records, options)
+
+    calls = []
+
+    def interrupted_compare(record_1, record_2, options):
+        if record_1["id"] == 3:
+            raise Interrupted()
+        calls.append((record_1["id"], record_2["id"]))
+        return compare.default_compare(record_1, record_2, options)
+
+    blocked = []
+
+    def counting_blocker(table_1, table_2, options):
+        blocked.append(len(table_1))
+        return compare.ngram_blocker(table_1, table_2, options)
+
+    options.checkpoint_dir = str(tmp_path / "checkpoint")
+    options.compare_fn = interrupted_compare
+    options.blocker_fn = counting_blocker
+    with pytest.raises(Interrupted):
+        compare.inner_join(records, records, options)
+    scored = len(calls)
+
+    def resumed_compare(record_1, record_2, options):
+        assert record_1["id"] >= 3, "Completed records were scored again."
+        return compare.default_compare(record_1, record_2, options)
+
+    # The compare function's name is part of the fingerprint.
+    resumed_compare.__qualname__ = interrupted_compare.__qualname__
+    options.compare_fn = resumed_compare
+    matches = compare.inner_join(records, records, options)
+    assert scored > 0
+    assert matches == expected
+    # Only the remaining left records were blocked.
+    assert blocked == [4, 2]
+
+    # A complete checkpoint doesn't block anything.
+    assert compare.inner_join(records, records, options) == expected
+    assert blocked == [4, 2]
@@ -11,14 +11,6 @@ def options():
     )
 
 
-def demo_records():
-    return [
-        {"id": 1, "text": "a hello world"},
-        {"id": 2, "text": "hella"},
-        {"id": 3, "text": "zzzz"},
-    ]
-
-
 def test_default_compare(options):
     def do_compare(text_1, text_2):
         r1 = {'text': text_1}
@@ -31,8 +23,8 @@ def test_default_compare(options):
     assert 0.0 == do_compare("hello", "zzzzz")
 
 
-def test_ngrams():
-    records = demo_records()
+def test_ngrams(demo_records):
+    records = demo_records
     index = compare.index_by_ngrams(
         records, index_key="text", ngram_size=4
     )
@@ -50,10 +42,10 @@ def test_ngrams():
     assert index["hell"] == {0, 1}
 
 
-def test_inner_join(options):
+def test_inner_join(options, demo_records):
     threshold = 0.8
-    records_1 = demo_records()
-    records_2 = demo_records()
+    records_1 = demo_records
+    records_2 = demo_records
     options['threshold'] = threshold
     matches = compare.inner_join(
         table_1=records_1,
@@ -73,9 +65,9 @@ def test_inner_join(options):
     assert len(below_threshold) == 0
 
 
-def test_inner_join_lower_threshold(options):
-    records_1 = demo_records()
-    records_2 = demo_records()
+def test_inner_join_lower_threshold(options, demo_records):
+    records_1 = demo_records
+    records_2 = demo_records
     options['threshold'] = 0.1
     matches = compare.inner_join(
         table_1=records_1,
@@ -93,9 +85,9 @@ def test_inner_join_lower_threshold(options):
     assert matches[2]["record_2"]["id"] == 1
 
 
-def test_inner_join_multiples(options):
-    records_1 = demo_records()
-    records_2 = demo_records()
+def test_inner_join_multiples(options, demo_records):
+    records_1 = demo_records
+    records_2 = demo_records
     options['threshold'] = 0.1
     matches = compare.inner_join(
         table_1=records_1,
@@ -144,3 +136,72 @@ def test_compare_numbers_subset(options):
     do_compare('hello 1 2', 'hello 1 2 3') == True
     do_compare('2 hello 1', 'hello 1 2') == True
     do_compare('3 hello 4', 'hello 3 5') == False
+
+
+def test_inner_join_dedupe(options, demo_records):
+    records_1 = demo_records + [
+        {"id": 4, "text": "a hello world"},
+        {"id": 5, "text": "hella"},
+    ]
+    records_2 = demo_records + [{"id": 6, "text": "zzzz"}]
+    options['threshold'] = 0.1
+    options['show_progress'] = False
+    expected = compare.inner_join(records_1, records_2, options)
+
+    options['dedupe'] = True
+    matches = compare.inner_join(records_1, records_2, options)
+    pairs = [(m["record_1"]["id"], m["record_2"]["id"], m["score"]) for m in matches]
+    expected_pairs = [(m["record_1"]["id"], m["record_2"]["id"], m["score"]) for m in expected]
+    assert sorted(pairs) == sorted(expected_pairs)
+    assert [m["_id_1"] for m in matches] == sorted(m["_id_1"] for m in matches)
+
+
+def test_group_by_value():
+    records = [{"text": "b a"}, {"text": "a-b"}, {"text": "b a"}]
+    distinct, group_ids = compare.group_by_value(records, "text")
+    assert distinct == [{"text": "b a"}, {"text": "a-b"}]
+    assert group_ids == [[0, 2], [1]]
+
+
+def test_inner_join_dedupe_equals_plain_join(options):
+    # Collation reorders the tokens of these values, and with them the numbers.
+    records_1 = [
+        {"id": 1, "text": "Smith, John"}, {"id": 2, "text": "John Smith"},
+        {"id": 3, "text": "Suite 2 Floor 1 Bldg"}, {"id": 4, "text": "John Smith"},
+    ]
+    records_2 = [{"id": 5, "text": "Jon Smith"}, {"id": 6, "text": "Suite 1 Floor 2 Bldgs"}]
+    options['show_progress'] = False
+    options['numbers_exact'] = True
+    expected = compare.inner_join(records_1, records_2, options)
+
+    options['dedupe'] = True
+    for table_1 in (records_1, records_1[::-1]):
+        matches = compare.inner_join(table_1, records_2, options)
+        pairs = {(m["record_1"]["id"], m["record_2"]["id"], m["score"]) for m in matches}
+        assert pairs == {(m["record_1"]["id"], m["record_2"]["id"], m["score"]) for m in expected}
+    assert {m["record_1"]["id"] for m in expected} == {2, 4}
+
+
+def test_inner_join_dedupe_excludes_rows(options, demo_records):
+    def exclude_id_2(record_1, record_2, options):
+        return record_1["id"] == 2
+
+    records = demo_records + [{"id": 4, "text": "hella"}]
+    options['dedupe'] = True
+    options['exclude_fn'] = exclude_id_2
+    matches = compare.inner_join(records, records, options)
+    assert [m["record_1"]["id"] for m in matches].count(2) == 0
+    assert [m["record_1"]["id"] for m in matches].count(4) == 2
+
+
+def test_threshold_sweep_matches_separate_joins(options, demo_records):
+    records = demo_records + [{"id": 4, "text": "hello world"}, {"id": 5, "text": "hellos"}]
+    options['show_progress'] = False
+    options['threshold'] = 0.3
+    sweep = compare.threshold_sweep(compare.inner_join(records, records, options), [0.8, 0.3, 0.5])
+    assert list(sweep) == [0.3, 0.5, 0.8]
+    for threshold, matches in sweep.items():
+        options['threshold'] = threshold
+        expected = compare.inner_join(records, records, options)
+        assert sorted((m["_id_1"], m["_id_2"]) for m in matches) == \
+            sorted((m["_id_1"], m["_id_2"]) for m in expected)
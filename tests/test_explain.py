@@ -0,0 +1,37 @@
+from click.testing import CliRunner
+
+from fuzzyjoin import cli, compare, explain
+
+
+def test_percentile():
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert explain.percentile(values, 50) == 6
+    assert explain.percentile(values, 100) == 10
+    assert explain.percentile([], 50) == 0
+
+
+def test_explain_full_sample(demo_records):
+    records = demo_records
+    options = compare.Options(field_1="text", field_2="text", threshold=0.1)
+    report = explain.explain(records, records, options)
+    assert report["sampled_records"] == 3
+    assert report["ngrams"] == 8
+    # "a hello world" and "hella" share "hel" and "ell", but each record is a
+    # candidate of the other once and so compared once.
+    assert report["estimated_candidate_pairs"] == 5
+    assert report["estimated_comparisons"] == 5
+    assert report["estimated_matches"] == 5
+    assert 0 < report["index_bytes"] < report["dict_index_bytes"]
+    assert report["estimated_seconds"] > 0
+
+
+def test_cli_explain_does_not_join(tmp_path):
+    left = tmp_path / "left.csv"
+    left.write_text("id,text\n1,a hello world\n2,hella\n")
+    output = tmp_path / "matches.csv"
+    result = CliRunner().invoke(cli.main, [
+        "--explain", "-f", "text", "text", "-o", str(output), str(left), str(left)
+    ])
+    assert result.exit_code == 0
+    assert "Estimated comparisons" in result.output
+    assert not output.exists()
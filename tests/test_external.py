@@ -0,0 +1,68 @@
+from fuzzyjoin import compare, external, utils
+
+
+def match_pairs(matches):
+    return sorted((m["_id_1"], m["_id_2"], m["score"]) for m in matches)
+
+
+def test_parse_size():
+    assert utils.parse_size("1024") == 1024
+    assert utils.parse_size("2KB") == 2048
+    assert utils.parse_size("1.5m") == 1572864
+    assert utils.parse_size("1G") == 1024 ** 3
+
+
+def test_group_pairs():
+    pairs = [0 << 32 | 1, 0 << 32 | 1, 0 << 32 | 2, 3 << 32 | 0]
+    assert list(external.group_pairs(iter(pairs))) == [(0, [1, 2]), (3, [0])]
+
+
+def test_write_run_sorts_and_dedupes(monkeypatch, tmp_path):
+    monkeypatch.setattr(external, "MERGE_CHUNK_SIZE", 2)
+    filepath = str(tmp_path / "run.bin")
+    external.write_run(external.array("Q", [5, 1, 3, 1, 5, 2]), filepath)
+    assert list(external.iter_run(filepath)) == [1, 2, 3, 5]
+
+
+def test_estimate_postings_samples_at_random(monkeypatch):
+    monkeypatch.setattr(external, "SAMPLE_SIZE", 100)
+    # The first records have no ngrams, so a sample of the first records
+    # would estimate none.
+    records = [{"text": ""}] * 100 + [{"text": "abcd"}] * 900
+    postings = external.estimate_postings(records, "text", 3, compare.default_collate)
+    assert 1000 < postings < 2000
+
+
+def test_external_blocker_matches_in_memory(monkeypatch, demo_records):
+    # Force several partitions written in several passes, a few pairs per
+    # run and a multi-pass merge.
+    monkeypatch.setattr(external, "MAX_OPEN_RUNS", 2)
+    monkeypatch.setattr(external, "MAX_OPEN_PARTITIONS", 2)
+    records = demo_records + [
+        {"id": 4, "text": "world of hellos"},
+        {"id": 5, "text": "zzzzz yellow"},
+    ]
+    options = compare.Options(field_1="text", field_2="text", threshold=0.1, show_progress=False)
+    expected = compare.inner_join(records, records, options)
+
+    options.memory_budget = 500
+    options.blocker_fn = external.external_ngram_blocker
+    matches = compare.inner_join(records, records, options)
+    assert match_pairs(matches) == match_pairs(expected)
+    assert [m["_id_1"] for m in matches] == sorted(m["_id_1"] for m in matches)
+
+
+def test_write_partitions_in_passes(monkeypatch, tmp_path, demo_records):
+    records = demo_records + [
+        {"id": 4, "text": "world of hellos"},
+        {"id": 5, "text": "zzzzz yellow"},
+    ]
+    args = ("text", 3, compare.default_collate, 5)
+    monkeypatch.setattr(external, "MAX_OPEN_PARTITIONS", 2)
+    filepaths = external.write_partitions(records, *args, prefix=str(tmp_path / "a"))
+    monkeypatch.setattr(external, "MAX_OPEN_PARTITIONS", 256)
+    expected = external.write_partitions(records, *args, prefix=str(tmp_path / "b"))
+    assert len(filepaths) == 5
+    for filepath, expected_filepath in zip(filepaths, expected):
+        postings = list(external.iter_postings(filepath))
+        assert postings == list(external.iter_postings(expected_filepath))
@@ -0,0 +1,192 @@
+import csv
+import sqlite3
+
+import pytest
+
+from fuzzyjoin import io, compare, utils
+
+
+def demo_rows():
+    return [
+        {"id": "1", "text": "a hello world", "extra": "x"},
+        {"id": "2", "text": "hella", "extra": "y"},
+        {"id": "3", "text": "zzzz", "extra": "z"},
+    ]
+
+
+def write_csv(filepath, rows):
+    with open(filepath, "w") as out:
+        writer = csv.DictWriter(out, fieldnames=list(rows[0].keys()), lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_parquet(filepath, rows, **kwargs):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    pq.write_table(pa.Table.from_pylist(rows), str(filepath), **kwargs)
+
+
+def write_sqlite(filepath, table, rows):
+    with sqlite3.connect(str(filepath)) as conn:
+        conn.execute(f"CREATE TABLE {table} (id, text, extra)")
+        conn.executemany(
+            f"INSERT INTO {table} VALUES (?, ?, ?)", [tuple(row.values()) for row in rows]
+        )
+    conn.close()
+
+
+@pytest.fixture
+def options():
+    return compare.Options(
+        field_1="text",
+        field_2="text",
+        threshold=0.8,
+        show_progress=False
+    )
+
+
+def test_write_matches_csv(tmp_path, options):
+    left = tmp_path / "left.csv"
+    write_csv(left, demo_rows())
+    matches = io.inner_join_files(str(left), str(left), options)
+    output = tmp_path / "matches.csv"
+    io.write_matches(matches, str(output))
+    lines = output.read_text().splitlines()
+    assert lines[0] == "score,id,text,extra,id,text,extra"
+    assert len(lines) == 4
+
+
+def test_inner_join_compressed_files(tmp_path, options):
+    left = tmp_path / "left.csv.gz"
+    with utils.open_text(str(left), "w") as out:
+        out.write("id,text,extra\n1,a hello world,x\n2,hella,y\n3,zzzz,z\n")
+    matches = io.inner_join_files(str(left), str(left), options)
+    assert len(matches) == 3
+    assert matches[1]["record_2"] == demo_rows()[1]
+
+    output = tmp_path / "matches.csv.gz"
+    io.write_matches(matches, str(output))
+    with utils.open_text(str(output)) as f:
+        lines = list(f)
+    assert lines[0] == "score,id,text,extra,id,text,extra\n"
+    assert len(lines) == 4
+
+
+def test_parquet_records_only_read_join_columns(tmp_path):
+    left = tmp_path / "left.parquet"
+    write_parquet(left, demo_rows())
+    records = io.load_records(str(left), ["text"])
+    assert len(records) == 3
+    assert records[1] == {"text": "hella"}
+    assert list(records)[2] == {"text": "zzzz"}
+    assert records.fetch_rows([2, 0]) == [demo_rows()[2], demo_rows()[0]]
+
+
+def test_parquet_fetch_rows_reads_matched_row_groups(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    left = tmp_path / "left.parquet"
+    rows = [{"id": str(i), "text": f"row {i}", "extra": "x"} for i in range(10)]
+    write_parquet(left, rows, row_group_size=3)
+    read_groups = []
+    read_row_groups = pq.ParquetFile.read_row_groups
+
+    def spy(self, groups, *args, **kwargs):
+        read_groups.append(list(groups))
+        return read_row_groups(self, groups, *args, **kwargs)
+
+    monkeypatch.setattr(pq.ParquetFile, "read_row_groups", spy)
+    records = io.load_records(str(left), ["text"])
+    assert records.fetch_rows([7, 0, 8, 7]) == [rows[7], rows[0], rows[8], rows[7]]
+    assert read_groups == [[0, 2]]
+
+
+def test_parquet_records_read_join_columns_as_text(tmp_path):
+    left = tmp_path / "left.parquet"
+    write_parquet(left, [{"text": None, "number": 1.5}, {"text": "hello", "number": None}])
+    records = io.load_records(str(left), ["text", "number"])
+    assert list(records) == [{"text": "", "number": "1.5"}, {"text": "hello", "number": ""}]
+    assert records.fetch_rows([0])[0] == {"text": None, "number": 1.5}
+
+
+def test_inner_join_parquet_files(tmp_path, options):
+    pq = pytest.importorskip("pyarrow.parquet")
+    left = tmp_path / "left.parquet"
+    right = tmp_path / "right.csv"
+    write_parquet(left, demo_rows())
+    write_csv(right, demo_rows())
+    matches = io.inner_join_files(str(left), str(right), options)
+    assert len(matches) == 3
+    assert matches[0]["record_1"] == demo_rows()[0]
+    assert matches[0]["record_2"] == demo_rows()[0]
+
+    output = tmp_path / "matches.parquet"
+    io.write_matches(matches, str(output))
+    table = pq.read_table(str(output))
+    assert table.num_rows == 3
+    assert table.column_names == [
+        "score", "id_1", "text_1", "extra_1", "id_2", "text_2", "extra_2"
+    ]
+
+
+def test_sqlite_records_only_read_join_columns(tmp_path):
+    db = tmp_path / "data.db"
+    write_sqlite(db, "names", demo_rows())
+    records = io.load_records(f"sqlite:///{db}?table=names", ["text"])
+    assert len(records) == 3
+    assert records[1] == {"text": "hella"}
+    assert list(records)[2] == {"text": "zzzz"}
+    assert records.fetch_rows([2, 0, 2]) == [demo_rows()[2], demo_rows()[0], demo_rows()[2]]
+
+
+def test_inner_join_sqlite_tables(tmp_path, options):
+    db = tmp_path / "data.db"
+    write_sqlite(db, "names", demo_rows())
+    uri = f"sqlite:///{db}?table=names"
+    matches = io.inner_join_files(uri, uri, options)
+    assert len(matches) == 3
+    assert matches[1]["record_1"] == demo_rows()[1]
+
+    output = f"sqlite:///{db}?table=matches"
+    assert not io.output_exists(output)
+    io.write_matches(matches, output)
+    assert io.output_exists(output)
+    with sqlite3.connect(str(db)) as conn:
+        cursor = conn.execute("SELECT * FROM matches")
+        assert [column[0] for column in cursor.description] == [
+            "score", "id_1", "text_1", "extra_1", "id_2", "text_2", "extra_2"
+        ]
+        assert len(cursor.fetchall()) == 3
+    conn.close()
+
+
+def test_sqlite_records_read_join_columns_as_text(tmp_path, options):
+    db = tmp_path / "data.db"
+    rows = demo_rows() + [{"id": "4", "text": None, "extra": "w"}]
+    rows.append({"id": "5", "text": 12345, "extra": "v"})
+    write_sqlite(db, "names", rows)
+    uri = f"sqlite:///{db}?table=names"
+    records = io.load_records(uri, ["text"])
+    assert records[3] == {"text": ""}
+    assert records[4] == {"text": "12345"}
+
+    # The empty text has no ngrams to block on.
+    matches = io.inner_join_files(uri, uri, options)
+    assert [(m["_id_1"], m["_id_2"]) for m in matches] == [(0, 0), (1, 1), (2, 2), (4, 4)]
+    assert matches[3]["record_1"] == rows[4]
+
+
+def test_sqlite_uri_paths():
+    assert io.parse_sqlite_uri("sqlite:///data.db?table=names") == ("data.db", "names")
+    assert io.parse_sqlite_uri("sqlite:////tmp/data.db?table=names") == ("/tmp/data.db", "names")
+    with pytest.raises(Exception):
+        io.parse_sqlite_uri("sqlite:///data.db")
+    assert io.resolve_path("sqlite:///data.db?table=names", "/base") == \
+        "sqlite:////base/data.db?table=names"
+    assert io.resolve_path("data.csv", "/base") == "/base/data.csv"
+
+
+def test_threshold_output():
+    assert io.threshold_output("out/matches.csv.gz", 0.8) == "out/matches_0.8.csv.gz"
+    assert io.threshold_output("sqlite:///data.db?table=matches", 0.8) == \
+        "sqlite:///data.db?table=matches_0_8"
@@ -0,0 +1,33 @@
+import random
+
+from fuzzyjoin import myers
+
+
+def reference_levenshtein(text_1, text_2):
+    row = list(range(len(text_2) + 1))
+    for i, char_1 in enumerate(text_1, 1):
+        previous, row = row, [i] + [0] * len(text_2)
+        for j, char_2 in enumerate(text_2, 1):
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (char_1 != char_2))
+    return row[-1]
+
+
+def test_levenshtein():
+    assert myers.levenshtein("kitten", "sitting") == 3
+    assert myers.levenshtein("", "abc") == 3
+    assert myers.levenshtein("abc", "") == 3
+    assert myers.levenshtein("", "") == 0
+    # Longer than a machine word.
+    assert myers.levenshtein("a" * 100 + "bc", "c" + "a" * 99) == 3
+
+
+def test_levenshtein_matches_reference():
+    rng = random.Random(0)
+    for _ in range(2000):
+        text_1 = "".join(rng.choice("abcd ") for _ in range(rng.randint(0, 15)))
+        text_2 = "".join(rng.choice("abcd ") for _ in range(rng.randint(0, 15)))
+        distance = reference_levenshtein(text_1, text_2)
+        assert myers.levenshtein(text_1, text_2) == distance
+        max_distance = rng.randint(0, 10)
+        bounded = myers.levenshtein(text_1, text_2, max_distance=max_distance)
+        assert bounded == (distance if distance <= max_distance else max_distance + 1)
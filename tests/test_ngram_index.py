@@ -0,0 +1,54 @@
+import random
+
+from fuzzyjoin import compare
+from fuzzyjoin.ngram_index import NgramIndex
+
+
+def test_same_lookups_as_dict_index(demo_records):
+    records = demo_records + [{"id": 4, "text": "world of hellos"}]
+    expected = compare.index_by_ngrams(records, 3, index_key="text")
+    index = compare.compact_index_by_ngrams(records, 3, index_key="text")
+    assert len(index) == len(expected)
+    assert set(index.keys()) == set(expected)
+    for ngram, ids in expected.items():
+        assert ngram in index
+        assert list(index[ngram]) == sorted(ids)
+    assert index.get("xyz") is None
+    assert "xyz" not in index
+    assert {ngram: set(ids) for ngram, ids in index.items()} == expected
+    assert sorted(index.block_sizes()) == sorted(len(ids) for ids in expected.values())
+
+
+def test_candidates_merge_sorted_postings():
+    rng = random.Random(0)
+    ngram_lists = [[rng.choice("abcdefgh") for _ in range(rng.randint(0, 5))] for _ in range(200)]
+    index = NgramIndex.build(ngram_lists)
+    for _ in range(50):
+        ngrams = [rng.choice("abcdefghz") for _ in range(rng.randint(0, 4))]
+        expected = sorted({id for id, ids in enumerate(ngram_lists) if set(ids) & set(ngrams)})
+        assert index.candidates(ngrams) == expected
+
+    max_block_size = min(index.block_sizes())
+    small = [ngram for ngram in index if len(index[ngram]) <= max_block_size]
+    assert index.candidates(list(index), max_block_size) == index.candidates(small)
+
+
+def test_memory_saved():
+    records = [{"text": f"record number {i}"} for i in range(2000)]
+    index = compare.compact_index_by_ngrams(records, 3, index_key="text")
+    assert index.nbytes() * 4 < index.dict_nbytes()
+
+
+def test_inner_join_compares_each_pair_once(demo_records):
+    calls = []
+
+    def counting_compare(record_1, record_2, options):
+        calls.append((record_1["id"], record_2["id"]))
+        return compare.default_compare(record_1, record_2, options)
+
+    records = demo_records + [{"id": 4, "text": "world of hellos"}]
+    options = compare.Options(
+        field_1="text", field_2="text", compare_fn=counting_compare, show_progress=False
+    )
+    compare.inner_join(records, records, options)
+    assert len(calls) == len(set(calls))
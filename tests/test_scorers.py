@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from fuzzyjoin import compare, scorers
+
+
+def scorer_options(**kwargs):
+    return compare.Options(field_1="text", field_2="text", **kwargs)
+
+
+def test_known_scores():
+    options = scorer_options()
+    assert scorers.get_scorer("levenshtein").score_fn("kitten", "sitting", options) == 1 - 3 / 7
+    assert scorers.osa_distance("abcd", "acbd") == 1
+    assert scorers.osa_distance("ca", "abc") == 3
+    jaro_winkler = scorers.jaro_winkler_score("MARTHA", "MARHTA", options)
+    assert jaro_winkler == pytest.approx(0.9611, abs=1e-4)
+    assert scorers.token_sort_score("world hello", "hello world", options) == 1.0
+    assert scorers.token_set_score("acme corp", "acme corp inc", options) == 1.0
+    with pytest.raises(Exception):
+        scorers.get_scorer("nope")
+
+
+def test_bounds_are_upper_bounds():
+    rng = random.Random(0)
+    words = ["acme", "corp", "inc", "north", "wind", "co", "ltd"]
+    # Without a threshold the levenshtein scores are exact rather than stopping early.
+    options = scorer_options(threshold=0.0)
+    for _ in range(500):
+        texts = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(1, 3))) + rng.choice(["", "s"])
+            for _ in range(2)
+        ]
+        for scorer in scorers.SCORERS.values():
+            score = scorer.score_fn(texts[0], texts[1], options)
+            for bound_fn in scorer.bound_fns:
+                assert bound_fn(texts[0], texts[1]) >= score - 1e-12, (scorer.name, texts)
+
+
+def test_compare_fuzzy_skips_hopeless_pairs():
+    calls = []
+
+    def counting_levenshtein(text_1, text_2):
+        calls.append((text_1, text_2))
+        return compare.levenshtein(text_1, text_2)
+
+    options = scorer_options(threshold=0.8, fuzzy_fn=counting_levenshtein)
+    result = compare.compare_fuzzy({"text": "hello"}, {"text": "hello world"}, options)
+    assert result["pass"] is False
+    assert result["meta"]["bound_fn"] == "length_bound"
+    assert calls == []
+
+    result = compare.compare_fuzzy({"text": "hello"}, {"text": "hallo"}, options)
+    assert result == {"pass": True, "score": 0.8, "meta": result["meta"]}
+    assert calls == [("hello", "hallo")]
+    assert result["meta"]["fuzzy_fn"] == "counting_levenshtein"
+
+
+def test_compare_fuzzy_meta_fuzzy_fn_only_when_used():
+    options = scorer_options(scorer="jaro-winkler")
+    result = compare.compare_fuzzy({"text": "hello"}, {"text": "hallo"}, options)
+    assert result["meta"]["scorer"] == "jaro-winkler"
+    assert "fuzzy_fn" not in result["meta"]
+
+
+def test_unknown_scorer():
+    with pytest.raises(Exception, match="Unknown scorer: foo"):
+        scorer_options(scorer="foo")
+
+
+@pytest.mark.parametrize("scorer", sorted(scorers.SCORERS))
+def test_inner_join_with_scorer(scorer):
+    records = [{"text": "acme corp"}, {"text": "acme corp inc"}, {"text": "zzzz"}]
+    options = scorer_options(threshold=0.9, scorer=scorer, show_progress=False)
+    matches = compare.inner_join(records, records, options)
+    pairs = [(m["_id_1"], m["_id_2"]) for m in matches]
+    assert (0, 0) in pairs and (2, 2) in pairs
+    # Jaro-Winkler rewards the common prefix.
+    assert ((0, 1) in pairs) == (scorer in ("jaro-winkler", "token-set"))
@@ -0,0 +1,70 @@
+import os
+import csv
+import sys
+import subprocess
+
+import pytest
+
+from fuzzyjoin import compare, io, shard
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fuzzyjoin_cli.py")
+
+
+def demo_rows():
+    words = ["hello world", "hella world", "world of hellos", "zzzz", "hello there", "yellow"]
+    return [{"id": str(i), "text": f"{words[i % len(words)]} {i % 3}"} for i in range(30)]
+
+
+def write_csv(filepath, rows):
+    with open(filepath, "w") as out:
+        writer = csv.DictWriter(out, fieldnames=list(rows[0].keys()), lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_cli(*args, cwd):
+    return subprocess.Popen([sys.executable, CLI] + list(args), cwd=str(cwd))
+
+
+@pytest.mark.parametrize("by", ["rows", "ngrams"])
+def test_shards_in_separate_processes_match_inner_join(tmp_path, by):
+    write_csv(tmp_path / "left.csv", demo_rows())
+    write_csv(tmp_path / "right.csv", demo_rows()[::-1])
+    assert run_cli(
+        "shard", "-f", "text", "text", "-t", "0.6", "--shards", "3", "--by", by,
+        "--out-dir", "shards", "left.csv", "right.csv", cwd=tmp_path
+    ).wait() == 0
+
+    spec_files = sorted((tmp_path / "shards").glob("*.json"))
+    assert len(spec_files) == 3
+    workers = [run_cli("run-shard", str(spec_file), cwd=tmp_path) for spec_file in spec_files]
+    assert [worker.wait() for worker in workers] == [0, 0, 0]
+
+    matches = shard.merge_shards(str(tmp_path / "shards"))
+    options = compare.Options(field_1="text", field_2="text", threshold=0.6, show_progress=False)
+    expected = io.inner_join_files(
+        str(tmp_path / "left.csv"), str(tmp_path / "right.csv"), options
+    )
+    assert [(m["_id_1"], m["_id_2"]) for m in matches] == \
+        sorted((m["_id_1"], m["_id_2"]) for m in expected)
+    assert matches[0]["record_1"] == demo_rows()[matches[0]["_id_1"]]
+
+    assert run_cli(
+        "merge", "-o", "matches.csv", "--multiples", "multiples.csv", "--yes", "shards",
+        cwd=tmp_path
+    ).wait() == 0
+    with open(tmp_path / "multiples.csv") as f:
+        multiples = list(csv.DictReader(f))
+    assert len(multiples) == len(compare.filter_multiples(matches))
+
+
+def test_merge_requires_finished_shards(tmp_path):
+    write_csv(tmp_path / "left.csv", demo_rows())
+    job = {"left": str(tmp_path / "left.csv"), "right": str(tmp_path / "left.csv"),
+           "fields": ["text", "text"], "show_progress": False}
+    spec_files = shard.write_shards(job, 2, "rows", str(tmp_path / "shards"))
+    shard.run_shard(spec_files[0])
+    with pytest.raises(Exception):
+        shard.merge_shards(str(tmp_path / "shards"))
+    shard.run_shard(spec_files[1])
+    assert shard.merge_shards(str(tmp_path / "shards"))
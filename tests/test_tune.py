@@ -0,0 +1,57 @@
+from fuzzyjoin import compare, tune
+
+
+def demo_tables():
+    right = [{"text": f"{a} {b}"} for a in ("acme", "globex", "initech", "umbrella")
+             for b in ("holdings", "systems", "labs", "foods", "media")]
+    left = [{"text": r["text"].replace("e", "a", 1)} for r in right]
+    return left, right
+
+
+def test_tune_reaches_target_recall():
+    left, right = demo_tables()
+    options = compare.Options(field_1="text", field_2="text", threshold=0.8)
+    report = tune.tune(left, right, options, target_recall=1.0)
+    assert report["best"]["recall"] == 1.0
+    assert len(report["results"]) == len(tune.NGRAM_SIZES) * len(tune.MAX_BLOCK_RATIOS)
+    passing = [r for r in report["results"] if r["recall"] >= 1.0]
+    assert report["best"]["comparisons"] == min(r["comparisons"] for r in passing)
+
+
+def test_apply_tuning_sets_options():
+    left, right = demo_tables()
+    options = compare.Options(field_1="text", field_2="text", threshold=0.8, show_progress=False)
+    report = tune.apply_tuning(left, right, options, target_recall=1.0)
+    assert options.ngram_size == report["ngram_size"]
+    assert options.max_block_size == report["max_block_size"]
+    matches = compare.inner_join(left, right, options)
+    assert len(matches) >= report["sample_matches"]
+
+
+def test_right_sample_holds_the_matches(monkeypatch):
+    # A random sample of 20 of the 420 right records would hold about one match.
+    monkeypatch.setattr(tune, "LEFT_SAMPLE_SIZE", 10)
+    monkeypatch.setattr(tune, "RIGHT_SAMPLE_SIZE", 20)
+    left, right = demo_tables()
+    right = right + [{"text": f"noise {i} {i * 7} {i * 13}"} for i in range(400)]
+    options = compare.Options(field_1="text", field_2="text", threshold=0.8)
+    report = tune.tune(left, right, options, target_recall=1.0)
+    assert report["sample_matches"] >= 10
+
+
+def test_apply_tuning_keeps_options_without_matches():
+    left = [{"text": "acme holdings"}, {"text": "globex systems"}]
+    right = [{"text": "zzzz"}, {"text": "yyyy"}]
+    options = compare.Options(field_1="text", field_2="text", ngram_size=4, show_progress=False)
+    report = tune.apply_tuning(left, right, options, target_recall=0.99)
+    assert report["sample_matches"] == 0
+    assert (options.ngram_size, options.max_block_size) == (4, 0)
+
+
+def test_max_block_size_skips_large_blocks():
+    records = [{"text": "hello"}, {"text": "hello world"}, {"text": "help"}]
+    options = compare.Options(field_1="text", field_2="text", max_block_size=2)
+    index = compare.compact_index_by_ngrams(records, 3, index_key="text")
+    blocks = compare.block_by_candidates([{"text": "hello"}], index, options)
+    # "hel" is in all three records and is skipped.
+    assert list(blocks) == [(0, [0, 1])]
@@ -1,3 +1,5 @@
+import pytest
+
 from fuzzyjoin import utils
 
 
@@ -32,3 +34,37 @@ def test_yield_chunks():
     assert chunks[0] == [1, 2]
     assert chunks[1] == [3, 4]
     assert chunks[2] == [5]
+
+
+@pytest.mark.parametrize("filename", ["names.csv", "names.csv.gz", "names.csv.bz2", "names.csv.xz"])
+def test_open_text_compressed(tmp_path, filename):
+    filepath = str(tmp_path / filename)
+    with utils.open_text(filepath, "w") as out:
+        out.write("id,name\n1,hello\n")
+    records = utils.load_csv_as_records(filepath)
+    assert records == [{"id": "1", "name": "hello"}]
+
+
+def test_open_text_zstandard(tmp_path):
+    pytest.importorskip("zstandard")
+    filepath = str(tmp_path / "names.csv.zst")
+    with utils.open_text(filepath, "w") as out:
+        out.write("id,name\n1,hello\n")
+    with open(filepath, "rb") as f:
+        assert not f.read().startswith(b"id,name")
+    assert utils.load_csv_as_records(filepath) == [{"id": "1", "name": "hello"}]
+
+
+def test_parse_ngram_size():
+    assert utils.parse_ngram_size("auto") == "auto"
+    assert utils.parse_ngram_size("4") == 4
+    assert utils.parse_ngram_size(2) == 2
+    for value in ("0", "-1", "2.5", "three", None):
+        with pytest.raises(Exception, match="Invalid ngram size"):
+            utils.parse_ngram_size(value)
+
+
+def test_parse_thresholds():
+    assert utils.parse_thresholds("0.8, 0.6,0.7,0.8") == [0.6, 0.7, 0.8]
+    with pytest.raises(Exception):
+        utils.parse_thresholds(" , ")